@@ -1,17 +1,18 @@
+from datetime import timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.contrib.sessions.models import Session
 from django.utils import timezone
-from django.contrib.auth import get_user_model
 from myapp.models import UserSessionStatus
 
-User = get_user_model()
-
 class Command(BaseCommand):
     """
     Command to check and update expired sessions, and perform cleanup actions.
 
-    This command identifies expired sessions, updates the session status of users,
-    and deletes the expired sessions from the database.
+    Users whose last activity is older than the session lifetime are marked as expired with
+    a single indexed update, and expired sessions are deleted in bulk. Sessions are never
+    decoded, so the cost follows the number of expired users rather than the size of the
+    session table.
 
     Attributes:
         help (str): Description of the command.
@@ -28,24 +29,13 @@ class Command(BaseCommand):
             **kwargs (dict): Arbitrary keyword arguments.
         """
         now = timezone.now()
-        expired_sessions = Session.objects.filter(expire_date__lt=now)
-
-        for session in expired_sessions:
-            user_id = session.get_decoded().get('_auth_user_id')
-            if user_id:
-                try:
-                    user = User.objects.get(pk=user_id)
-                    UserSessionStatus.objects.update_or_create(
-                        user=user,
-                        defaults={
-                            'is_logged_in': False,
-                            'session_expired': True
-                        }
-                    )
-                    print(f"Updated session status for user {user.username}")
-                except User.DoesNotExist:
-                    print(f"User ID {user_id} not found in User model.")
-
-            session.delete()  # Delete the expired session
-
-        print("Expired sessions have been processed and cleaned up.")
\ No newline at end of file
+        # A session expires SESSION_COOKIE_AGE after it was last saved, which is never later
+        # than the user's last request
+        inactive_since = now - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+
+        expired_users = UserSessionStatus.objects.filter(
+            session_expired=False, last_seen__lt=inactive_since
+        ).update(is_logged_in=False, session_expired=True)
+        deleted_sessions, _ = Session.objects.filter(expire_date__lt=now).delete()
+
+        print(f"Marked {expired_users} users as expired and deleted {deleted_sessions} expired sessions.")
@@ -1,70 +1,104 @@
 from django.core.management.base import BaseCommand
-from kubernetes import client, config
-from myapp.models import UserSessionStatus  
 import os
+from datetime import timedelta
 from django.conf import settings
+from django.utils import timezone
+from myapp.models import AccessibilityGrid, TravelTimeMatrix, UserSessionStatus, UserRoutingPod
+from myapp.services.accessibility_grid import get_accessibility_raster_path
+from myapp.services.graph_artifacts import delete_user_files, prune_graph_caches
+from myapp.services.travel_time_matrix import get_matrix_path
+from myapp.services.routing_teardown import teardown_routing_objects
 from django.db import models
 
 
+def get_referenced_artifact_hashes() -> set:
+    """
+    Collect the graph-cache hashes that routing pods serve or are being built for.
+
+    Returns:
+        set: The artifact hashes of every user's desired and active network.
+    """
+    hashes = set()
+    for artifact_hash, active_artifact_hash in UserRoutingPod.objects.values_list('artifact_hash', 'active_artifact_hash'):
+        hashes.update((artifact_hash, active_artifact_hash))
+    hashes.discard(None)
+    return hashes
+
+
+def expire_user_files(users_needing_cleanup) -> int:
+    """
+    Delete the files and built artifacts of users who have been absent longer than the retention period.
+
+    Their routing state forgets its graph-cache, so the cache is pruned with the other unreferenced
+    ones, and a returning user builds their network again.
+
+    Args:
+        users_needing_cleanup (QuerySet): The session statuses of logged-out and expired users.
+
+    Returns:
+        int: The number of users whose files were deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.USER_FILES_RETENTION_DAYS)
+    user_ids = list(users_needing_cleanup.filter(last_seen__lt=cutoff).values_list('user_id', flat=True))
+
+    expired = 0
+    for user_id in user_ids:
+        deleted = delete_user_files(user_id)
+        result_paths = [get_accessibility_raster_path(grid_id) for grid_id in AccessibilityGrid.objects.filter(user_id=user_id).values_list('pk', flat=True)]
+        result_paths += [get_matrix_path(matrix_id) for matrix_id in TravelTimeMatrix.objects.filter(user_id=user_id).values_list('pk', flat=True)]
+        for result_path in result_paths:
+            if os.path.exists(result_path):
+                os.remove(result_path)
+                deleted.append(result_path)
+        if deleted:
+            expired += 1
+            print(f"Deleted {len(deleted)} files of user {user_id}.")
+
+    AccessibilityGrid.objects.filter(user_id__in=user_ids).delete()
+    TravelTimeMatrix.objects.filter(user_id__in=user_ids).delete()
+    UserRoutingPod.objects.filter(user_id__in=user_ids, desired_state=UserRoutingPod.DESIRED_ABSENT).update(
+        artifact_hash=None, active_artifact_hash=None, active_slot=''
+    )
+    return expired
+
+
 class Command(BaseCommand):
-    help = 'Closes Kubernetes Deployments and Services for users with expired sessions or who have logged out, and deletes associated .osm and .yaml files'
+    help = 'Closes Kubernetes Deployments and Services for users with expired sessions or who have logged out, and deletes the files of long-absent users'
 
     def handle(self, *args: tuple, **kwargs: dict) -> None:
         print("Starting cleanup for users with expired sessions or logged out users...")
 
-        # Load Kubernetes config
-        # config.load_kube_config()  # For local testing
-        config.load_incluster_config()
-
-        apps_v1_api = client.AppsV1Api()
-        core_v1_api = client.CoreV1Api()
-
         users_needing_cleanup = UserSessionStatus.objects.filter(
             models.Q(is_logged_in=False) | models.Q(session_expired=True)
         )
+        # Users torn down by an earlier run are skipped; the reconciler removes any leftovers
+        routing_pods = UserRoutingPod.objects.filter(
+            user_id__in=users_needing_cleanup.values('user_id')
+        ).exclude(desired_state=UserRoutingPod.DESIRED_ABSENT, pool_pod_name__isnull=True)
+        user_ids = list(routing_pods.values_list('user_id', flat=True))
+
+        # Stop the routing reconciler from bringing these users' pods back
+        UserRoutingPod.objects.filter(user_id__in=user_ids).update(
+            desired_state=UserRoutingPod.DESIRED_ABSENT, pool_pod_name=None
+        )
+
+        # Delete every user's routing objects with a few label-selector requests.
+        # The .osm and .yaml files are kept for the retention period, so a returning user can be
+        # resumed from their graph-cache
+        stats = teardown_routing_objects(user_ids)
+
+        print(
+            f"Finished cleanup for {stats['users']} expired or logged-out users: deleted "
+            f"{stats['deployments']} deployments, {stats['services']} services and "
+            f"{stats['pool_pods']} pool pods in {stats['seconds']}s."
+        )
+
+        if settings.USER_FILES_RETENTION_DAYS:
+            expired = expire_user_files(users_needing_cleanup)
+            if expired:
+                print(f"Deleted the files of {expired} users absent for over {settings.USER_FILES_RETENTION_DAYS} days.")
 
-        # Updated media directory path
-        osm_files_dir = os.path.join(settings.BASE_DIR, 'myapp', 'media', 'user_osm_files')
-
-        for user_status in users_needing_cleanup:
-            user_id = user_status.user_id
-            deployment_name = f'graphhopper-{user_id}'
-            service_name = f'graphhopper-{user_id}-service'
-
-            # --- Delete Deployment ---
-            try:
-                apps_v1_api.delete_namespaced_deployment(
-                    name=deployment_name, namespace="default", body=client.V1DeleteOptions()
-                )
-                print(f'Successfully deleted deployment for user {user_id}')
-            except client.rest.ApiException as e:
-                if e.status == 404:
-                    print(f'Deployment not found for user {user_id}, may already be deleted.')
-                else:
-                    print(f'Error deleting deployment for user {user_id}: {e}')
-
-            # --- Delete Service ---
-            try:
-                core_v1_api.delete_namespaced_service(
-                    name=service_name, namespace="default", body=client.V1DeleteOptions()
-                )
-                print(f'Successfully deleted service for user {user_id}')
-            except client.rest.ApiException as e:
-                if e.status == 404:
-                    print(f'Service not found for user {user_id}, may already be deleted.')
-                else:
-                    print(f'Error deleting service for user {user_id}: {e}')
-
-            # --- Delete .osm and .yaml files ---
-            osm_file_path = os.path.join(osm_files_dir, f'{user_id}.osm')
-            yaml_file_path = os.path.join(osm_files_dir, f'{user_id}.yaml')
-
-            for file_path in [osm_file_path, yaml_file_path]:
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                        print(f"Deleted file: {file_path}")
-                    except Exception as e:
-                        print(f"Error deleting file {file_path}: {e}")
-
-        print("Finished cleanup for expired or logged-out users.")
+        # Rebuilds with new inputs and expired users leave graph-caches behind
+        pruned = prune_graph_caches(get_referenced_artifact_hashes)
+        if pruned:
+            print(f"Deleted {len(pruned)} unreferenced graph-caches.")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from myapp.services.routing_pod_status import watch_routing_pods
+
+
+class Command(BaseCommand):
+    """
+    Command to run the cluster-wide GraphHopper pod watcher.
+
+    A single long-lived process watches every app=graphhopper pod and writes its status
+    to UserRoutingPod, so views never have to query the Kubernetes API for pod status.
+
+    Attributes:
+        help (str): Description of the command.
+    """
+
+    help = 'Watch all GraphHopper pods and cache their routing status in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--namespace', default='default', help='Namespace of the GraphHopper pods.')
+
+    def handle(self, *args: tuple, **kwargs: dict) -> None:
+        """
+        Handle the command execution.
+
+        Args:
+            *args (tuple): Variable length argument list.
+            **kwargs (dict): Arbitrary keyword arguments.
+        """
+        print("Starting routing pod watcher...")
+        watch_routing_pods(namespace=kwargs['namespace'])
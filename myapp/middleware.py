@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserSessionStatus
+
+# Seconds between last_seen writes for the same user, across all processes
+LAST_SEEN_WRITE_INTERVAL = 60
+
+
+class UserActivityMiddleware:
+    """
+    Records when each logged-in user was last active, so expired sessions can be found with
+    an indexed query instead of decoding every stored session.
+
+    Writes are throttled per user through a shared cache key, and the session itself is left
+    untouched so its expiry does not change.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            # Only the first request of each interval gets to add the key and write
+            if cache.add(f"last_seen:{user.id}", 1, LAST_SEEN_WRITE_INTERVAL):
+                UserSessionStatus.objects.filter(user_id=user.id).update(last_seen=timezone.now())
+        return self.get_response(request)
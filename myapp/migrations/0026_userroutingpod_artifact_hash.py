@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0025_userroutingpod_delete_userport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='artifact_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0026_userroutingpod_artifact_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='node_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='edge_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0027_userroutingpod_node_count_edge_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='routing_status',
+            field=models.CharField(choices=[('stopped', 'Stopped'), ('pending', 'Pending'), ('importing', 'Importing'), ('ready', 'Ready')], default='stopped', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+def mark_existing_pods_running(apps, schema_editor):
+    # Keep routing pods that are already up, so the reconciler does not remove them
+    UserRoutingPod = apps.get_model('myapp', 'UserRoutingPod')
+    UserRoutingPod.objects.filter(
+        artifact_hash__isnull=False,
+        routing_status__in=['pending', 'importing', 'ready'],
+    ).update(desired_state='running')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0028_userroutingpod_routing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='desired_state',
+            field=models.CharField(choices=[('absent', 'Absent'), ('running', 'Running')], db_index=True, default='absent', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='userroutingpod',
+            name='routing_status',
+            field=models.CharField(choices=[('stopped', 'Stopped'), ('pending', 'Pending'), ('importing', 'Importing'), ('ready', 'Ready'), ('failed', 'Failed')], default='stopped', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_pods_running, migrations.RunPython.noop),
+    ]
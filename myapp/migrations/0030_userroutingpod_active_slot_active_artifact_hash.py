@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0029_userroutingpod_desired_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='active_artifact_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='active_slot',
+            field=models.CharField(blank=True, choices=[('blue', 'Blue'), ('green', 'Green')], default='', max_length=10),
+        ),
+    ]
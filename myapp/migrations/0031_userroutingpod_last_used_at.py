@@ -0,0 +1,31 @@
+# Generated by Django 4.2.10 on 2026-10-19 12:15
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_idle_clock(apps, schema_editor):
+    # Existing routing pods count as used now, so they are not scaled down straight away
+    UserRoutingPod = apps.get_model('myapp', 'UserRoutingPod')
+    UserRoutingPod.objects.filter(desired_state='running').update(last_used_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0030_userroutingpod_active_slot_active_artifact_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='last_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='userroutingpod',
+            name='desired_state',
+            field=models.CharField(choices=[('absent', 'Absent'), ('running', 'Running'), ('idle', 'Idle')], db_index=True, default='absent', max_length=20),
+        ),
+        migrations.RunPython(start_idle_clock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0031_userroutingpod_last_used_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='pool_pod_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0032_userroutingpod_pool_pod_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='pod_ip',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.10 on 2026-10-19 13:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0033_userroutingpod_pod_ip'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersessionstatus',
+            name='last_seen',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
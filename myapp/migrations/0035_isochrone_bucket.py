@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0034_usersessionstatus_last_seen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='isochrone',
+            name='bucket',
+            field=models.IntegerField(default=0),
+        ),
+    ]
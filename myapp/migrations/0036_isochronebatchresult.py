@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:05
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0035_isochrone_bucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IsochroneBatchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.UUIDField(db_index=True)),
+                ('origin_index', models.IntegerField()),
+                ('origin', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+                ('mode_selection', models.CharField(max_length=10)),
+                ('buckets', models.IntegerField()),
+                ('time_limit', models.IntegerField()),
+                ('bucket', models.IntegerField()),
+                ('geom', django.contrib.gis.db.models.fields.GeometryField(srid=4326)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
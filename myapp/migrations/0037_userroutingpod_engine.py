@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0036_isochronebatchresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='engine',
+            field=models.CharField(choices=[('graphhopper', 'GraphHopper'), ('local', 'In-process')], default='graphhopper', max_length=20),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.10 on 2026-10-19 16:20
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0037_userroutingpod_engine'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessibilityGrid',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('mode_selection', models.CharField(max_length=10)),
+                ('cell_size', models.IntegerField()),
+                ('facilities', django.contrib.gis.db.models.fields.MultiPointField(srid=4326)),
+                ('rows', models.IntegerField(default=0)),
+                ('cols', models.IntegerField(default=0)),
+                ('bounds', models.JSONField(blank=True, null=True)),
+                ('summary', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0038_accessibilitygrid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userroutingpod',
+            name='warmup_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.gis.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class GeoData(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -25,10 +26,76 @@ class MarkerGeometry(models.Model):
 class Isochrone(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     geom = models.GeometryField()
+    bucket = models.IntegerField(default=0)
 
     def __str__(self):
         return f"Isochrone for {self.user.username}"
 
+class IsochroneBatchResult(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    batch_id = models.UUIDField(db_index=True)
+    origin_index = models.IntegerField()
+    origin = models.PointField()
+    mode_selection = models.CharField(max_length=10)
+    buckets = models.IntegerField()
+    time_limit = models.IntegerField()
+    bucket = models.IntegerField()
+    geom = models.GeometryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"IsochroneBatchResult {self.batch_id} for {self.user.username}"
+
+class AccessibilityGrid(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    mode_selection = models.CharField(max_length=10)
+    cell_size = models.IntegerField()
+    facilities = models.MultiPointField()
+    rows = models.IntegerField(default=0)
+    cols = models.IntegerField(default=0)
+    bounds = models.JSONField(null=True, blank=True)
+    summary = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"AccessibilityGrid {self.pk} for {self.user.username} ({self.status})"
+
+class TravelTimeMatrix(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    mode_selection = models.CharField(max_length=10)
+    origins = models.JSONField()
+    destinations = models.JSONField()
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"TravelTimeMatrix {self.pk} for {self.user.username} ({self.status})"
+
 class NetworkType(models.Model):
     SELECTION_CHOICES = [
         ('motorway', 'Motorway'),
@@ -56,10 +123,54 @@ class IsochronePreferences(models.Model):
         return f"{self.user.username}'s Isochrone Preferences"
 
 class UserRoutingPod(models.Model):
+    STATUS_STOPPED = 'stopped'
+    STATUS_PENDING = 'pending'
+    STATUS_IMPORTING = 'importing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_STOPPED, 'Stopped'),
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_IMPORTING, 'Importing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    DESIRED_ABSENT = 'absent'
+    DESIRED_RUNNING = 'running'
+    DESIRED_IDLE = 'idle'
+    DESIRED_STATE_CHOICES = [
+        (DESIRED_ABSENT, 'Absent'),
+        (DESIRED_RUNNING, 'Running'),
+        (DESIRED_IDLE, 'Idle'),
+    ]
+    SLOT_BLUE = 'blue'
+    SLOT_GREEN = 'green'
+    SLOT_CHOICES = [
+        (SLOT_BLUE, 'Blue'),
+        (SLOT_GREEN, 'Green'),
+    ]
+    ENGINE_GRAPHHOPPER = 'graphhopper'
+    ENGINE_LOCAL = 'local'
+    ENGINE_CHOICES = [
+        (ENGINE_GRAPHHOPPER, 'GraphHopper'),
+        (ENGINE_LOCAL, 'In-process'),
+    ]
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     service_name = models.CharField(max_length=50)
     pod_name = models.CharField(max_length=255, blank=True, null=True)  
     button_activate = models.BooleanField(default=False)
+    routing_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_STOPPED)
+    desired_state = models.CharField(max_length=20, choices=DESIRED_STATE_CHOICES, default=DESIRED_ABSENT, db_index=True)
+    artifact_hash = models.CharField(max_length=64, blank=True, null=True)
+    node_count = models.IntegerField(default=0)
+    edge_count = models.IntegerField(default=0)
+    active_slot = models.CharField(max_length=10, choices=SLOT_CHOICES, blank=True, default='')
+    active_artifact_hash = models.CharField(max_length=64, blank=True, null=True)
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    pool_pod_name = models.CharField(max_length=255, blank=True, null=True)
+    pod_ip = models.GenericIPAddressField(blank=True, null=True)
+    engine = models.CharField(max_length=20, choices=ENGINE_CHOICES, default=ENGINE_GRAPHHOPPER)
+    warmup_ms = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return f"UserRoutingPod for {self.user.username} (service_name: {self.service_name}, Pod Name: {self.pod_name})"
@@ -78,6 +189,7 @@ class UserSessionStatus(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     is_logged_in = models.BooleanField(default=True)
     session_expired = models.BooleanField(default=False)  
+    last_seen = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         status = 'Logged In' if self.is_logged_in else 'Logged Out'
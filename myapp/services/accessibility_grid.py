@@ -0,0 +1,219 @@
+import json
+import os
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+from django.conf import settings
+from django.contrib.gis.geos import MultiPoint, Point
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from scipy.sparse.csgraph import dijkstra
+
+from ..models import AccessibilityGrid, BoxGeometry, MarkerGeometry
+from .graph_artifacts import get_user_files_dir
+from .local_routing import (
+    MAX_SNAP_METERS, METERS_PER_DEGREE, MODES, get_local_graph_path, get_mode_csgraph, load_local_graph,
+    project_coordinates
+)
+
+ACCESSIBILITY_FOLDER = 'accessibility'
+DEFAULT_CELL_SIZE = 100  # meters
+MIN_CELL_SIZE = 20  # meters
+# Walking speed from a cell's center to the nearest node of the network, in m/s
+ACCESS_SPEED = 5 / 3.6
+# The map summary shows these travel time bands in minutes
+BAND_MINUTES = (5, 10, 15, 20, 30, 45, 60)
+
+
+def get_accessibility_raster_path(grid_id: int) -> str:
+    """
+    Returns the path of the travel time array of an accessibility grid.
+
+    Args:
+        grid_id (int): The ID of the accessibility grid.
+
+    Returns:
+        str: The path of the .npy file on the shared volume.
+    """
+    return os.path.join(get_user_files_dir(), ACCESSIBILITY_FOLDER, f"{grid_id}.npy")
+
+
+def parse_accessibility_request(user, body: bytes, default_mode: str) -> tuple:
+    """
+    Parse and validate the facilities, mode and cell size of an accessibility grid request.
+
+    The body is JSON with optional "facilities" as [latitude, longitude] pairs, "mode" and
+    "cell_size" in meters. Without facilities, the user's markers are used.
+
+    Args:
+        user (User): The user requesting the grid.
+        body (bytes): The request body.
+        default_mode (str): The mode used if the request does not name one.
+
+    Returns:
+        tuple: The facilities as a MultiPoint, the mode and the cell size in meters.
+
+    Raises:
+        ValidationError: If the request is malformed or the grid would be too large.
+    """
+    try:
+        payload = json.loads(body) if body else {}
+        facilities = [Point(float(lon), float(lat), srid=4326) for lat, lon in payload.get('facilities') or []]
+        cell_size = int(payload.get('cell_size') or DEFAULT_CELL_SIZE)
+    except (ValueError, TypeError, AttributeError):
+        raise ValidationError('Send a JSON body with "facilities" as a list of [latitude, longitude] pairs.')
+
+    if not facilities:
+        facilities = [marker.geom for marker in MarkerGeometry.objects.filter(user=user)]
+    if not facilities:
+        raise ValidationError('No facilities given. Send them with the request or place markers on the map.')
+
+    mode = payload.get('mode') or default_mode
+    if mode not in MODES:
+        raise ValidationError(f"Unknown transport mode: {mode}")
+    if cell_size < MIN_CELL_SIZE:
+        raise ValidationError(f"The cell size has to be at least {MIN_CELL_SIZE} meters.")
+
+    box = BoxGeometry.objects.filter(user=user).first()
+    if not box:
+        raise ValidationError('You need to draw and upload a bounding box.')
+    rows, cols = get_grid_shape(box.geom.extent, cell_size)
+    if rows * cols > settings.ACCESSIBILITY_MAX_CELLS:
+        raise ValidationError(f"The grid would have {rows * cols} cells, more than the {settings.ACCESSIBILITY_MAX_CELLS} allowed. Please use larger cells.")
+
+    return MultiPoint(*facilities, srid=4326), mode, cell_size
+
+
+def get_cell_degrees(bounds: tuple, cell_size: int) -> tuple:
+    """
+    Convert a cell size in meters to degrees around the middle of the bounds.
+
+    Args:
+        bounds (tuple): The (west, south, east, north) bounds of the grid.
+        cell_size (int): The cell size in meters.
+
+    Returns:
+        tuple: The cell width and height in degrees.
+    """
+    mid_latitude = np.deg2rad((bounds[1] + bounds[3]) / 2)
+    return cell_size / (METERS_PER_DEGREE * np.cos(mid_latitude)), cell_size / METERS_PER_DEGREE
+
+
+def get_grid_shape(bounds: tuple, cell_size: int) -> tuple:
+    """
+    Get the number of rows and columns of a grid covering the bounds.
+
+    Args:
+        bounds (tuple): The (west, south, east, north) bounds of the grid.
+        cell_size (int): The cell size in meters.
+
+    Returns:
+        tuple: The number of rows and columns.
+    """
+    cell_width, cell_height = get_cell_degrees(bounds, cell_size)
+    return max(1, int(np.ceil((bounds[3] - bounds[1]) / cell_height))), max(1, int(np.ceil((bounds[2] - bounds[0]) / cell_width)))
+
+
+def get_nearest_facility_times(graph: dict, mode: str, facility_nodes: np.ndarray) -> np.ndarray:
+    """
+    Compute the travel time from every node to its nearest facility.
+
+    Shortest paths run on the reversed graph, so one-way streets are followed towards the
+    facilities. All facilities are the sources of a single multi-source Dijkstra search, which
+    keeps the distance to the nearest one per node.
+
+    Args:
+        graph (dict): The loaded graph from load_local_graph.
+        mode (str): The transport mode.
+        facility_nodes (np.ndarray): The node index of each facility.
+
+    Returns:
+        np.ndarray: The travel time in seconds of each node, inf where no facility is reachable.
+    """
+    reversed_csgraph = get_mode_csgraph(graph, mode).transpose().tocsr()
+    return dijkstra(reversed_csgraph, directed=True, indices=facility_nodes, min_only=True)
+
+
+def summarize_bands(travel_times: np.ndarray, bounds: tuple, cell_size: int) -> dict:
+    """
+    Merge the cells of each travel time band into polygons the map can show.
+
+    Args:
+        travel_times (np.ndarray): The travel time grid in seconds, with row 0 at the north edge.
+        bounds (tuple): The (west, south, east, north) bounds of the grid.
+        cell_size (int): The cell size in meters.
+
+    Returns:
+        dict: A GeoJSON FeatureCollection with one feature per non-empty band.
+    """
+    cell_width, cell_height = get_cell_degrees(bounds, cell_size)
+    row_index, col_index = np.indices(travel_times.shape)
+    minutes = travel_times / 60
+
+    features = []
+    lower = 0
+    for upper in BAND_MINUTES:
+        in_band = (minutes >= lower) & (minutes < upper)
+        if in_band.any():
+            west = bounds[0] + col_index[in_band] * cell_width
+            north = bounds[3] - row_index[in_band] * cell_height
+            cells = shapely.box(west, north - cell_height, west + cell_width, north)
+            features.append({
+                'type': 'Feature',
+                'geometry': mapping(shapely.union_all(cells)),
+                'properties': {'min_minutes': lower, 'max_minutes': upper, 'cells': int(in_band.sum())}
+            })
+        lower = upper
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def compute_accessibility_grid(grid: AccessibilityGrid):
+    """
+    Compute the travel time to the nearest facility for every cell of a user's bounding box.
+
+    Each cell is snapped to its nearest node, and walking from the cell's center to that node
+    is added to the node's travel time. The grid is written as a float32 .npy array, NaN for
+    cells away from the network and inf where no facility is reachable. A banded GeoJSON
+    summary is stored on the grid.
+
+    Args:
+        grid (AccessibilityGrid): The pending grid to compute.
+    """
+    AccessibilityGrid.objects.filter(pk=grid.pk).update(status=AccessibilityGrid.STATUS_RUNNING)
+    box = BoxGeometry.objects.filter(user_id=grid.user_id).first()
+    if not box:
+        raise ValidationError('The bounding box was removed before the grid was computed.')
+    bounds = box.geom.extent
+    rows, cols = get_grid_shape(bounds, grid.cell_size)
+    cell_width, cell_height = get_cell_degrees(bounds, grid.cell_size)
+
+    graph = load_local_graph(get_local_graph_path(grid.user_id))
+    facility_lons, facility_lats = np.array([point.coords for point in grid.facilities]).T
+    facility_distances, facility_nodes = graph['tree'].query(project_coordinates(graph, facility_lons, facility_lats))
+    facility_nodes = np.unique(facility_nodes[facility_distances <= MAX_SNAP_METERS])
+    if not len(facility_nodes):
+        raise ValidationError('None of the facilities are on the road network.')
+
+    node_times = get_nearest_facility_times(graph, grid.mode_selection, facility_nodes)
+
+    cell_lons = bounds[0] + (np.arange(cols) + 0.5) * cell_width
+    cell_lats = bounds[3] - (np.arange(rows) + 0.5) * cell_height
+    grid_lons, grid_lats = np.meshgrid(cell_lons, cell_lats)
+    cell_distances, cell_nodes = graph['tree'].query(project_coordinates(graph, grid_lons.ravel(), grid_lats.ravel()))
+    travel_times = np.where(
+        cell_distances <= MAX_SNAP_METERS, node_times[cell_nodes] + cell_distances / ACCESS_SPEED, np.nan
+    ).astype(np.float32).reshape(rows, cols)
+
+    raster_path = get_accessibility_raster_path(grid.pk)
+    os.makedirs(os.path.dirname(raster_path), exist_ok=True)
+    np.save(raster_path, travel_times)
+
+    AccessibilityGrid.objects.filter(pk=grid.pk).update(
+        status=AccessibilityGrid.STATUS_DONE,
+        rows=rows,
+        cols=cols,
+        bounds=list(bounds),
+        summary=summarize_bands(travel_times, bounds, grid.cell_size),
+        finished_at=timezone.now()
+    )
+    print(f"Accessibility grid {grid.pk}: {rows}x{cols} cells from {len(facility_nodes)} facilities.")
@@ -1,21 +1,42 @@
 import os
-from datetime import datetime
-from kubernetes import client, config, watch
+from kubernetes import client, config
 from kubernetes.client.rest import ApiException
 from kubernetes.config.config_exception import ConfigException 
+from django.contrib.auth.models import User
 from django.http import HttpRequest
-from ..models import UserRoutingPod
+from django.utils import timezone
+from ..models import UserRoutingPod, UserPreviousInputs
+from .graph_artifacts import compute_artifact_hash, get_graph_cache_path, graph_cache_exists, get_user_files_dir
+from .prepare_docker_data import fetch_latest_user_inputs, check_if_inputs_changed
+
+POD_USER_FILES_DIR = "/webapp/myapp/media/user_osm_files"
+
+# Resource tiers for GraphHopper pods, picked by the estimated in-memory size of the graph.
+# The memory limit leaves room above the heap for metaspace, thread stacks and off-heap buffers.
+ROUTING_RESOURCE_TIERS = [
+    {"max_graph_mb": 128, "heap": "384m", "cpu_request": "100m", "cpu_limit": "500m", "memory_request": "512Mi", "memory_limit": "768Mi"},
+    {"max_graph_mb": 512, "heap": "1g", "cpu_request": "250m", "cpu_limit": "1", "memory_request": "1280Mi", "memory_limit": "1536Mi"},
+    {"max_graph_mb": 1536, "heap": "2g", "cpu_request": "500m", "cpu_limit": "2", "memory_request": "2560Mi", "memory_limit": "3Gi"},
+    {"max_graph_mb": None, "heap": "4g", "cpu_request": "1", "cpu_limit": "4", "memory_request": "5Gi", "memory_limit": "6Gi"},
+]
+
+_kube_config_loaded = False
 
 def load_kube_config():
     """
     Load Kubernetes configuration.
     Tries in-cluster first; falls back to local kubeconfig for development.
+    The configuration is only loaded once per process.
     """
+    global _kube_config_loaded
+    if _kube_config_loaded:
+        return
     try:
         config.load_incluster_config()
     except ConfigException:
         kubeconfig_path = os.environ.get("KUBECONFIG", os.path.expanduser("~/.kube/config"))
         config.load_kube_config(config_file=kubeconfig_path)
+    _kube_config_loaded = True
 
 def get_k8s_apis() -> tuple:
     """
@@ -28,31 +49,256 @@ def get_k8s_apis() -> tuple:
     core_v1_api = client.CoreV1Api()
     return apps_v1_api, core_v1_api
 
-def create_deployment_object(user_id: int, image: str) -> client.V1Deployment:
+def estimate_graph_memory_mb(node_count: int, edge_count: int, importing: bool = False) -> float:
+    """
+    Estimate how much memory GraphHopper needs to hold a graph.
+
+    Uses rough per-node and per-edge costs of the base graph plus the prepared profile. An
+    import keeps the OSM data in memory alongside the graph, so it is estimated at twice the size.
+
+    Args:
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
+        importing (bool): Whether the estimate is for the import rather than serving.
+
+    Returns:
+        float: The estimated memory in megabytes.
+    """
+    graph_bytes = node_count * 64 + edge_count * 160
+    if importing:
+        graph_bytes *= 2
+    return graph_bytes / (1024 * 1024)
+
+
+def get_routing_resources(node_count: int, edge_count: int, importing: bool = False) -> tuple:
+    """
+    Get the resource requirements and JVM options for a GraphHopper container from the graph size.
+
+    Args:
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
+        importing (bool): Whether the container runs the import rather than serving.
+
+    Returns:
+        tuple: The V1ResourceRequirements and the JAVA_OPTS string.
+    """
+    graph_mb = estimate_graph_memory_mb(node_count or 0, edge_count or 0, importing)
+    tier = next(t for t in ROUTING_RESOURCE_TIERS if t["max_graph_mb"] is None or graph_mb < t["max_graph_mb"])
+
+    resources = client.V1ResourceRequirements(
+        requests={"cpu": tier["cpu_request"], "memory": tier["memory_request"]},
+        limits={"cpu": tier["cpu_limit"], "memory": tier["memory_limit"]}
+    )
+    java_opts = f"-Xms{tier['heap']} -Xmx{tier['heap']}"
+    return resources, java_opts
+
+
+def create_graph_builder_job_object(user_id: int, image: str, artifact_hash: str, node_count: int, edge_count: int) -> client.V1Job:
+    """
+    Create a Kubernetes job that imports the user's OSM file into a graph-cache once.
+
+    The import is written to a temporary folder on the shared volume and only moved to its
+    content-addressed location once GraphHopper has finished, so routing pods never see a
+    partially written cache.
+
+    Args:
+        user_id (int): The user ID whose OSM file and configuration are imported.
+        image (str): The GraphHopper Docker image to use in the job.
+        artifact_hash (str): The content address of the graph-cache to build.
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
+
+    Returns:
+        client.V1Job: The V1Job object.
+    """
+    job_name = f"graph-builder-{artifact_hash[:16]}"
+    cache_path = get_graph_cache_path(artifact_hash, root=POD_USER_FILES_DIR)
+    tmp_cache_path = f"{cache_path}.tmp"
+
+    build_command = (
+        f"rm -rf {tmp_cache_path} && mkdir -p $(dirname {cache_path}) && "
+        f"./graphhopper.sh --import -i {POD_USER_FILES_DIR}/{user_id}.osm -c {POD_USER_FILES_DIR}/{user_id}.yaml -o {tmp_cache_path} && "
+        f"rm -rf {cache_path} && mv {tmp_cache_path} {cache_path}"
+    )
+    resources, java_opts = get_routing_resources(node_count, edge_count, importing=True)
+
+    template = client.V1PodTemplateSpec(
+        metadata=client.V1ObjectMeta(
+            labels={"app": "graph-builder", "artifact": artifact_hash[:16]}
+        ),
+        spec=client.V1PodSpec(
+            restart_policy="Never",
+            containers=[
+                client.V1Container(
+                    name="graph-builder",
+                    image=image,
+                    command=["sh", "-c", build_command],
+                    env=[client.V1EnvVar(name="JAVA_OPTS", value=java_opts)],
+                    resources=resources,
+                    volume_mounts=[
+                        client.V1VolumeMount(
+                            name="efs-claim",
+                            mount_path=POD_USER_FILES_DIR
+                        )
+                    ],
+                    security_context=client.V1SecurityContext(
+                        run_as_non_root=True,
+                        run_as_user=1000,
+                        run_as_group=1000,
+                        allow_privilege_escalation=False,
+                        capabilities=client.V1Capabilities(drop=["ALL"]),
+                        read_only_root_filesystem=False
+                    )
+                )
+            ],
+            volumes=[
+                client.V1Volume(
+                    name="efs-claim",
+                    persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
+                        claim_name="efs-claim"
+                    )
+                )
+            ]
+        )
+    )
+
+    job = client.V1Job(
+        api_version="batch/v1",
+        kind="Job",
+        metadata=client.V1ObjectMeta(name=job_name),
+        spec=client.V1JobSpec(
+            backoff_limit=1,
+            ttl_seconds_after_finished=600,
+            template=template
+        )
+    )
+
+    return job
+
+
+def start_graph_builder_job(batch_v1_api: client.BatchV1Api, job: client.V1Job, namespace: str) -> str:
+    """
+    Start a graph builder job, or look up the one already building the same artifact.
+
+    This does not wait for the import, so it can be called on every reconciliation cycle.
+
+    Args:
+        batch_v1_api (client.BatchV1Api): The BatchV1Api client.
+        job (client.V1Job): The job object to run.
+        namespace (str): The namespace in which to run the job.
+
+    Returns:
+        str: "running", "succeeded" or "failed".
+    """
+    job_name = job.metadata.name
+    try:
+        batch_v1_api.create_namespaced_job(namespace=namespace, body=job)
+        print(f"Graph builder job {job_name} created.")
+        return "running"
+    except ApiException as e:
+        if e.status != 409:
+            print(f"Exception when creating graph builder job: {e}")
+            return "failed"
+
+    # Same artifact is already being built, so report that job's progress
+    status = batch_v1_api.read_namespaced_job_status(name=job_name, namespace=namespace).status
+    if status.succeeded:
+        return "succeeded"
+    if status.failed and status.failed > job.spec.backoff_limit:
+        print(f"Graph builder job {job_name} failed.")
+        return "failed"
+    return "running"
+
+
+def get_graph_artifact_hash(osm_path: str, yaml_path: str) -> str:
+    """
+    Get the content address of the graph-cache for an OSM file and configuration.
+
+    Args:
+        osm_path (str): Path to the user's OSM file.
+        yaml_path (str): Path to the user's GraphHopper configuration file.
+
+    Returns:
+        str: The artifact hash of the graph-cache.
+    """
+    return compute_artifact_hash(osm_path, yaml_path, os.getenv("IMAGE"))
+
+
+def get_routing_labels(user_id: int, slot: str = "") -> dict:
+    """
+    Get the labels identifying a user's GraphHopper pods.
+
+    Args:
+        user_id (int): The user ID the pods belong to.
+        slot (str): The blue/green slot of the pods, or an empty string outside blue/green mode.
+
+    Returns:
+        dict: The pod labels.
+    """
+    labels = {"app": "graphhopper", "user": str(user_id)}
+    if slot:
+        labels["slot"] = slot
+    return labels
+
+
+def get_deployment_name(user_id: int, slot: str = "") -> str:
+    """
+    Get the name of a user's GraphHopper deployment.
+
+    Args:
+        user_id (int): The user ID the deployment belongs to.
+        slot (str): The blue/green slot of the deployment, or an empty string outside blue/green mode.
+
+    Returns:
+        str: The deployment name.
+    """
+    return f"graphhopper-{user_id}-{slot}" if slot else f"graphhopper-{user_id}"
+
+
+def create_deployment_object(user_id: int, image: str, artifact_hash: str, node_count: int, edge_count: int, slot: str = "", replicas: int = 1) -> client.V1Deployment:
     """
     Create a Kubernetes deployment object.
 
+    The pod copies the prebuilt graph-cache from the shared volume into its local storage
+    before GraphHopper starts, so GraphHopper loads the graph instead of importing it.
+    Resource requests, limits and the JVM heap are sized from the graph.
+
     Args:
         user_id (int): The user ID for which the deployment is created.
         image (str): The Docker image to use in the deployment.
+        artifact_hash (str): The content address of the graph-cache to serve.
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
+        slot (str): The blue/green slot of the deployment, or an empty string outside blue/green mode.
+        replicas (int): The number of pods, 0 while the user's routing is idle.
 
     Returns:
         client.V1Deployment: The V1Deployment object.
     """
-    deployment_name = f"graphhopper-{user_id}"
+    deployment_name = get_deployment_name(user_id, slot)
+    labels = get_routing_labels(user_id, slot)
     container_port = 8989
+    admin_port = 8990
+    cache_path = get_graph_cache_path(artifact_hash, root=POD_USER_FILES_DIR)
+    resources, java_opts = get_routing_resources(node_count, edge_count)
 
     template = client.V1PodTemplateSpec(
         metadata=client.V1ObjectMeta(
-            labels={"app": "graphhopper", "user": str(user_id)}
+            labels=labels,
+            annotations={"isochrone/graph-artifact": artifact_hash}
         ),
         spec=client.V1PodSpec(
             init_containers=[
                 client.V1Container(
-                    name="init-permissions",
+                    name="init-graph-cache",
                     image="busybox",
-                    command=["sh", "-c", "mkdir -p /data/default-gh && chown 1000:1000 /data/default-gh && chmod 700 /data/default-gh"],
+                    command=["sh", "-c", f"mkdir -p /data/default-gh && cp -a {cache_path}/. /data/default-gh/ && chown -R 1000:1000 /data/default-gh && chmod 700 /data/default-gh"],
                     volume_mounts=[
+                        client.V1VolumeMount(
+                            name="efs-claim",
+                            mount_path=POD_USER_FILES_DIR,
+                            read_only=True
+                        ),
                         client.V1VolumeMount(
                             name="local-storage",
                             mount_path="/data/default-gh"
@@ -64,11 +310,16 @@ def create_deployment_object(user_id: int, image: str) -> client.V1Deployment:
                 client.V1Container(
                     name="graphhopper",
                     image=image,
-                    ports=[client.V1ContainerPort(container_port=container_port)],
+                    ports=[
+                        client.V1ContainerPort(container_port=container_port),
+                        client.V1ContainerPort(container_port=admin_port, name="admin")
+                    ],
+                    env=[client.V1EnvVar(name="JAVA_OPTS", value=java_opts)],
+                    resources=resources,
                     volume_mounts=[
                         client.V1VolumeMount(
                             name="efs-claim", 
-                            mount_path="/webapp/myapp/media/user_osm_files"
+                            mount_path=POD_USER_FILES_DIR
                         ),
                         client.V1VolumeMount(
                             name="local-storage", 
@@ -78,10 +329,20 @@ def create_deployment_object(user_id: int, image: str) -> client.V1Deployment:
                     command=[
                         "./graphhopper.sh",
                         "-i",
-                        f"/webapp/myapp/media/user_osm_files/{user_id}.osm",
+                        f"{POD_USER_FILES_DIR}/{user_id}.osm",
                         "-c",
-                        "/webapp/myapp/media/user_osm_files/master.yaml"
+                        f"{POD_USER_FILES_DIR}/{user_id}.yaml",
+                        "-o",
+                        "/data/default-gh"
                     ],
+                    # Only ready once GraphHopper has loaded the graph and its health checks pass
+                    readiness_probe=client.V1Probe(
+                        http_get=client.V1HTTPGetAction(path="/healthcheck", port=admin_port),
+                        initial_delay_seconds=5,
+                        period_seconds=5,
+                        timeout_seconds=3,
+                        failure_threshold=3
+                    ),
                     security_context=client.V1SecurityContext(
                         run_as_non_root=True,
                         run_as_user=1000,
@@ -108,9 +369,9 @@ def create_deployment_object(user_id: int, image: str) -> client.V1Deployment:
     )
 
     spec = client.V1DeploymentSpec(
-        replicas=1,
+        replicas=replicas,
         selector=client.V1LabelSelector(
-            match_labels={"app": "graphhopper", "user": str(user_id)}
+            match_labels=labels
         ),
         template=template
     )
@@ -118,48 +379,24 @@ def create_deployment_object(user_id: int, image: str) -> client.V1Deployment:
     deployment = client.V1Deployment(
         api_version="apps/v1",
         kind="Deployment",
-        metadata=client.V1ObjectMeta(name=deployment_name),
+        metadata=client.V1ObjectMeta(
+            name=deployment_name,
+            labels=labels
+        ),
         spec=spec
     )
     
     return deployment
 
 
-def create_or_update_deployment(apps_v1_api: client.AppsV1Api, deployment: client.V1Deployment, namespace: str):
-    """
-    Create or update a Kubernetes deployment.
-
-    Args:
-        apps_v1_api (client.AppsV1Api): The AppsV1Api client.
-        deployment (client.V1Deployment): The deployment object to create or update.
-        namespace (str): The namespace in which to create or update the deployment.
-    """
-    deployment_name = deployment.metadata.name
-    try:
-        apps_v1_api.create_namespaced_deployment(namespace=namespace, body=deployment)
-        print(f"Deployment {deployment_name} created.")
-    except ApiException as e:
-        if e.status == 409:  # Deployment already exists, so update it
-            existing_deployment = apps_v1_api.read_namespaced_deployment(name=deployment_name, namespace=namespace)
-            if not existing_deployment.spec.template.metadata.annotations:
-                existing_deployment.spec.template.metadata.annotations = {}
-            existing_deployment.spec.template.metadata.annotations['kubectl.kubernetes.io/restartedAt'] = datetime.now().isoformat()
-            try:
-                apps_v1_api.patch_namespaced_deployment(name=deployment_name, namespace=namespace, body=existing_deployment)
-                print(f"Deployment {deployment_name} updated and new pods are being created.")
-            except ApiException as e:
-                print(f"Exception when updating deployment: {e}")
-        else:
-            print(f"Exception when creating/updating deployment: {e}")
-
-
-def create_service_object(user_id: int, container_port: int) -> client.V1Service:
+def create_service_object(user_id: int, container_port: int, slot: str = "") -> client.V1Service:
     """
     Create a Kubernetes service object.
 
     Args:
         user_id (int): The user ID for which the service is created.
         container_port (int): The port inside the container.
+        slot (str): The blue/green slot the service routes to, or an empty string outside blue/green mode.
 
     Returns:
         client.V1Service: The V1Service object.
@@ -169,10 +406,13 @@ def create_service_object(user_id: int, container_port: int) -> client.V1Service
     service_body = client.V1Service(
         api_version="v1",
         kind="Service",
-        metadata=client.V1ObjectMeta(name=service_name),
+        metadata=client.V1ObjectMeta(
+            name=service_name,
+            labels={"app": "graphhopper", "user": str(user_id)}
+        ),
         spec=client.V1ServiceSpec(
             type="ClusterIP",
-            selector={"app": "graphhopper", "user": str(user_id)},
+            selector=get_routing_labels(user_id, slot),
             ports=[client.V1ServicePort(port=container_port, target_port=container_port, protocol="TCP")]
         )
     )
@@ -180,120 +420,104 @@ def create_service_object(user_id: int, container_port: int) -> client.V1Service
     return service_body
 
 
-def create_or_update_service(core_v1_api: client.CoreV1Api, service: client.V1Service, namespace: str) -> bool:
+def create_or_update_deployment_and_service(user_id: int, request: HttpRequest, artifact_hash: str, node_count: int, edge_count: int):
     """
-    Create or update a Kubernetes service.
-
-    Args:
-        core_v1_api (client.CoreV1Api): The CoreV1Api client.
-        service (client.V1Service): The service object to create or update.
-        namespace (str): The namespace in which to create or update the service.
-
-    Returns:
-        bool: True if the service was created or updated, False otherwise.
-    """
-    service_name = service.metadata.name
-    try:
-        core_v1_api.create_namespaced_service(namespace=namespace, body=service)
-        print(f"Service {service.metadata.name} created with type ClusterIP")
-        return True
-    except ApiException as e:
-        if e.status == 409:
-            core_v1_api.replace_namespaced_service(name=service_name, namespace=namespace, body=service)
-            print(f"Service {service_name} updated with type ClusterIP")
-            return True
-        else:
-            print(f"Exception when creating/updating service: {e}")
-            return False
-
+    Main function to request the user's deployment and service.
 
-
-def update_user_service(user_id: int, service_name: str):
-    """
-    Update the UserPort object with the new service name.
+    This only records the desired routing state. The routing reconciler creates or updates
+    the deployment and service on its next cycle, so the request does not wait on Kubernetes.
 
     Args:
-        user_id (int): The user ID associated with the service.
-        service_name (str): The name of the created or updated service.
+        user_id (int): The user ID for which the deployment and service are created or updated.
+        request (HttpRequest): The HTTP request object containing the user information.
+        artifact_hash (str): The content address of the graph-cache to serve.
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
     """
-    UserRoutingPod.objects.update_or_create(user_id=user_id, defaults={'service_name': service_name})
+    UserRoutingPod.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'service_name': f"graphhopper-{user_id}-service",
+            'artifact_hash': artifact_hash,
+            'node_count': node_count,
+            'edge_count': edge_count,
+            'desired_state': UserRoutingPod.DESIRED_RUNNING,
+            'engine': UserRoutingPod.ENGINE_GRAPHHOPPER,
+            'last_used_at': timezone.now()
+        }
+    )
 
 
-def create_or_update_deployment_and_service(user_id: int, request: HttpRequest):
+def use_local_routing(user_id: int, artifact_hash: str, node_count: int, edge_count: int):
     """
-    Main function to create or update deployment and service.
+    Serve a user's isochrones from the in-process engine instead of a routing pod.
+
+    The user's routing objects are no longer desired, so the reconciler removes any pod left
+    from an earlier, larger network.
 
     Args:
-        user_id (int): The user ID for which the deployment and service are created or updated.
-        request (HttpRequest): The HTTP request object containing the user information.
+        user_id (int): The ID of the user.
+        artifact_hash (str): The content address of the user's current network.
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
     """
-    load_kube_config()
-    namespace = "default"
-    apps_v1_api, core_v1_api = get_k8s_apis()
-    image = os.getenv("IMAGE")
-
-    deployment = create_deployment_object(user_id, image)
-    create_or_update_deployment(apps_v1_api, deployment, namespace)
-
-    service = create_service_object(user_id, container_port=8989)
-    service_created_or_updated = create_or_update_service(core_v1_api, service, namespace)
-
-    if service_created_or_updated:
-        update_user_service(user_id, service.metadata.name)
-    else:
-        print("Service was not successfully created or updated. Skipping dependent operations.")
+    UserRoutingPod.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'service_name': f"graphhopper-{user_id}-service",
+            'artifact_hash': artifact_hash,
+            'active_artifact_hash': None,
+            'node_count': node_count,
+            'edge_count': edge_count,
+            'desired_state': UserRoutingPod.DESIRED_ABSENT,
+            'engine': UserRoutingPod.ENGINE_LOCAL,
+            'routing_status': UserRoutingPod.STATUS_READY,
+            'button_activate': True,
+            'pod_name': None,
+            'pod_ip': None,
+            'last_used_at': timezone.now()
+        }
+    )
+    print(f"Routing for user {user_id} ({edge_count} edges) is served in-process.")
 
 
-def is_user_pod_running(user_id: int, request: HttpRequest, timeout_immediately: bool) -> bool:
+def resume_user_routing(user: User) -> bool:
     """
-    Checks if a pod associated with a user is running within a Kubernetes cluster.
+    Bring a returning user's routing pod back up from their last built graph-cache.
 
-    This function watches for pod events in the "default" namespace, filtering by a label selector
-    that includes the user ID. It can either return immediately or wait for up to 5 minutes to see
-    if the pod reaches the "Running" state.
+    The pod is only resumed if the user's inputs have not changed since the last build and the
+    OSM and YAML files on the shared volume still hash to the artifact that was built from them.
 
     Args:
-        user_id (int): The ID of the user whose pod status is being checked.
-        request (HttpRequest): The Django HTTP request object, used to access the user.
-        timeout_immediately (bool): If True, the function will return almost immediately if the pod is not found;
-                                    if False, it will wait for up to 5 minutes.
+        user (User): The user who logged in.
 
     Returns:
-        bool: True if the pod is running, False otherwise.
+        bool: True if the routing pod is being resumed, otherwise False.
     """
-    # Use in-cluster configuration
-    load_kube_config()
-    # Set the API client
-    core_v1_api = client.CoreV1Api()
-
-    # Define namespace and label selector
-    namespace = "default"
-    label_selector = f"app=graphhopper,user={user_id}"
-
-    # Initialize the watch
-    w = watch.Watch()
-
-    # Dynamically set the timeout for the watch based on the condition
-    timeout_seconds = 1 if timeout_immediately else 300  # 1 second or 5 minutes
-
-    # Start watching for Pod events with dynamic timeout
-    for event in w.stream(core_v1_api.list_namespaced_pod, namespace=namespace, label_selector=label_selector, timeout_seconds=timeout_seconds):
-        print(event['type'])
-        if event['type'] in ['ADDED', 'MODIFIED']:
-            pod = event['object']
-            if pod.status.phase == "Running":
-                print(f"Pod {pod.metadata.name} is running.")
-                
-                user_port_obj, created = UserRoutingPod.objects.update_or_create(
-                    user=request.user,
-                    defaults={'pod_name': pod.metadata.name, 'button_activate': True}
-                )
-                return True
-        elif timeout_immediately:
-            # If set for immediate timeout, check if the event type is not 'ADDED'
-            print("Event type is not 'ADDED', returning False immediately.")
-            return False
-
-    # If the loop exits without finding the Pod in Running state
-    print("Timeout reached, pod not in Running state.")
-    return False
\ No newline at end of file
+    user_pod = UserRoutingPod.objects.filter(
+        user=user, artifact_hash__isnull=False, engine=UserRoutingPod.ENGINE_GRAPHHOPPER
+    ).first()
+    if not user_pod or user_pod.desired_state == UserRoutingPod.DESIRED_RUNNING:
+        return False
+
+    previous_inputs = UserPreviousInputs.objects.filter(user=user).first()
+    if not previous_inputs or check_if_inputs_changed(previous_inputs, *fetch_latest_user_inputs(user)):
+        return False
+
+    osm_path = os.path.join(get_user_files_dir(), f"{user.id}.osm")
+    yaml_path = os.path.join(get_user_files_dir(), f"{user.id}.yaml")
+    if not (os.path.exists(osm_path) and os.path.exists(yaml_path) and graph_cache_exists(user_pod.artifact_hash)):
+        return False
+    if get_graph_artifact_hash(osm_path, yaml_path) != user_pod.artifact_hash:
+        return False
+
+    resumed = UserRoutingPod.objects.filter(pk=user_pod.pk, artifact_hash=user_pod.artifact_hash).exclude(
+        desired_state=UserRoutingPod.DESIRED_RUNNING
+    ).update(desired_state=UserRoutingPod.DESIRED_RUNNING, last_used_at=timezone.now())
+    if resumed:
+        # Report the pod as starting, so the build button waits for it instead of rebuilding
+        UserRoutingPod.objects.filter(pk=user_pod.pk, routing_status=UserRoutingPod.STATUS_STOPPED).update(
+            routing_status=UserRoutingPod.STATUS_PENDING
+        )
+        print(f"Resuming routing for user {user.id} from artifact {user_pod.artifact_hash[:16]}.")
+    return bool(resumed)
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+
+from ..utils.graph_arrays import get_graph_arrays_path
+
+GRAPH_CACHE_FOLDER = 'graph_cache'
+
+
+def get_user_files_dir() -> str:
+    """
+    Returns the folder on the shared volume that holds the users' OSM and YAML files.
+
+    Returns:
+        str: The absolute path of the user files folder.
+    """
+    webapp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    return os.path.join(webapp_dir, 'media', 'user_osm_files')
+
+
+def compute_artifact_hash(osm_path: str, yaml_path: str, image: str) -> str:
+    """
+    Computes the content address of a GraphHopper graph-cache.
+
+    The hash covers everything the import depends on: the OSM file, the GraphHopper
+    configuration and the GraphHopper image, so identical inputs always map to the same cache.
+
+    Args:
+        osm_path (str): Path to the user's OSM file.
+        yaml_path (str): Path to the GraphHopper configuration file.
+        image (str): The GraphHopper Docker image used for the import.
+
+    Returns:
+        str: The hex sha256 digest identifying the artifact.
+    """
+    digest = hashlib.sha256()
+    digest.update((image or '').encode('utf-8'))
+
+    for file_path in (osm_path, yaml_path):
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def get_graph_cache_path(artifact_hash: str, root: str = None) -> str:
+    """
+    Returns the folder holding the prepared graph-cache for an artifact.
+
+    Args:
+        artifact_hash (str): The content address of the artifact.
+        root (str): The user files folder, defaults to the local mount of the shared volume.
+
+    Returns:
+        str: The path of the graph-cache folder.
+    """
+    root = root or get_user_files_dir()
+    return os.path.join(root, GRAPH_CACHE_FOLDER, artifact_hash)
+
+
+def graph_cache_exists(artifact_hash: str) -> bool:
+    """
+    Checks if a graph-cache has been fully built for an artifact.
+
+    GraphHopper writes its 'properties' file last, and the builder job only moves the
+    cache into place once the import has finished, so its presence marks a usable cache.
+
+    Args:
+        artifact_hash (str): The content address of the artifact.
+
+    Returns:
+        bool: True if the graph-cache exists, otherwise False.
+    """
+    if not artifact_hash:
+        return False
+    return os.path.exists(os.path.join(get_graph_cache_path(artifact_hash), 'properties'))
+
+
+def prune_graph_caches(get_referenced_hashes) -> list:
+    """
+    Deletes the graph-caches that no user's routing state points to anymore.
+
+    Every rebuild with new inputs writes a cache under a new hash, so the caches of replaced
+    networks are removed here. The folders are listed before the referenced hashes are read,
+    so a cache that becomes referenced while pruning runs is kept. A builder job's unfinished
+    '.tmp' folder is kept as long as its hash is referenced.
+
+    Args:
+        get_referenced_hashes (callable): Returns the set of artifact hashes still served or being built.
+
+    Returns:
+        list: The names of the deleted graph-cache folders.
+    """
+    cache_root = os.path.join(get_user_files_dir(), GRAPH_CACHE_FOLDER)
+    if not os.path.isdir(cache_root):
+        return []
+    names = os.listdir(cache_root)
+    referenced_hashes = get_referenced_hashes()
+
+    deleted = []
+    for name in sorted(names):
+        artifact_hash = name[:-len('.tmp')] if name.endswith('.tmp') else name
+        if artifact_hash in referenced_hashes:
+            continue
+        try:
+            shutil.rmtree(os.path.join(cache_root, name))
+            deleted.append(name)
+        except OSError as e:
+            print(f"Error deleting graph-cache {name}: {e}")
+    return deleted
+
+
+def delete_user_files(user_id: int) -> list:
+    """
+    Deletes a user's OSM file, GraphHopper configuration and graph arrays.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        list: The paths that were deleted.
+    """
+    osm_path = os.path.join(get_user_files_dir(), f"{user_id}.osm")
+    paths = [osm_path, os.path.join(get_user_files_dir(), f"{user_id}.yaml"), get_graph_arrays_path(osm_path)]
+
+    deleted = []
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            else:
+                continue
+            deleted.append(path)
+        except OSError as e:
+            print(f"Error deleting file {path}: {e}")
+    return deleted
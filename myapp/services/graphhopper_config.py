@@ -0,0 +1,105 @@
+import os
+import yaml
+
+from .graph_artifacts import get_user_files_dir
+
+# Graphs below this many edges are served in flexible mode without any preparation
+FLEXIBLE_MODE_MAX_EDGES = 5000
+# Graphs below this many edges get landmarks (hybrid mode) instead of contraction hierarchies
+LM_MODE_MAX_EDGES = 50000
+# Graphs from this many edges are memory mapped instead of held on the heap
+MMAP_MIN_EDGES = 1000000
+
+PREPARATION_THREAD_TIERS = [
+    (200000, 1),
+    (1000000, 2),
+    (None, 4),
+]
+
+
+def get_preparation_threads(edge_count: int, profile_count: int) -> int:
+    """
+    Picks the number of preparation threads from the graph size.
+
+    GraphHopper prepares one profile per thread, so the count is capped by the number of
+    profiles being prepared.
+
+    Args:
+        edge_count (int): The number of edges in the graph.
+        profile_count (int): The number of profiles that are prepared.
+
+    Returns:
+        int: The number of preparation threads.
+    """
+    for max_edges, threads in PREPARATION_THREAD_TIERS:
+        if max_edges is None or edge_count < max_edges:
+            return max(1, min(threads, profile_count))
+
+
+def build_user_graphhopper_config(master_config: dict, mode_selection: str, node_count: int, edge_count: int) -> dict:
+    """
+    Builds a GraphHopper configuration tuned to the user's graph and selected mode.
+
+    All profiles stay defined so every mode can still be queried, but only the selected
+    profile is prepared. Tiny graphs skip preparation entirely and small graphs use
+    landmarks, since contraction hierarchies would cost more to prepare than they save.
+
+    Args:
+        master_config (dict): The parsed master configuration.
+        mode_selection (str): The user's selected isochrone profile ('car', 'foot' or 'bike').
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
+
+    Returns:
+        dict: The user's GraphHopper configuration.
+    """
+    user_config = dict(master_config)
+    graphhopper = dict(user_config.get('graphhopper', {}))
+
+    profile_names = [profile['name'] for profile in graphhopper.get('profiles', [])]
+    prepared_profiles = [mode_selection] if mode_selection in profile_names else profile_names[:1]
+
+    if edge_count < FLEXIBLE_MODE_MAX_EDGES:
+        graphhopper['profiles_ch'] = []
+        graphhopper['profiles_lm'] = []
+    elif edge_count < LM_MODE_MAX_EDGES:
+        graphhopper['profiles_ch'] = []
+        graphhopper['profiles_lm'] = [{'profile': name} for name in prepared_profiles]
+        graphhopper['prepare.lm.threads'] = get_preparation_threads(edge_count, len(prepared_profiles))
+    else:
+        graphhopper['profiles_ch'] = [{'profile': name} for name in prepared_profiles]
+        graphhopper['profiles_lm'] = []
+        graphhopper['prepare.ch.threads'] = get_preparation_threads(edge_count, len(prepared_profiles))
+
+    graphhopper['graph.dataaccess.default_type'] = 'MMAP' if edge_count >= MMAP_MIN_EDGES else 'RAM_STORE'
+
+    user_config['graphhopper'] = graphhopper
+    print(f"GraphHopper config for {node_count} nodes / {edge_count} edges: "
+          f"ch={graphhopper['profiles_ch']}, lm={graphhopper['profiles_lm']}, "
+          f"dataaccess={graphhopper['graph.dataaccess.default_type']}")
+    return user_config
+
+
+def write_user_graphhopper_config(output_yaml_path: str, mode_selection: str, node_count: int, edge_count: int) -> str:
+    """
+    Writes the user's GraphHopper configuration generated from master.yaml.
+
+    Args:
+        output_yaml_path (str): Path to write the user's configuration to.
+        mode_selection (str): The user's selected isochrone profile.
+        node_count (int): The number of nodes in the graph.
+        edge_count (int): The number of edges in the graph.
+
+    Returns:
+        str: The path of the written configuration.
+    """
+    master_yaml_path = os.path.join(get_user_files_dir(), 'master.yaml')
+    with open(master_yaml_path) as f:
+        master_config = yaml.safe_load(f)
+
+    user_config = build_user_graphhopper_config(master_config, mode_selection, node_count, edge_count)
+
+    with open(output_yaml_path, 'w') as f:
+        yaml.safe_dump(user_config, f, sort_keys=False)
+
+    return output_yaml_path
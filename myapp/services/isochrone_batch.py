@@ -0,0 +1,163 @@
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.exceptions import ValidationError
+
+from ..forms import IsochroneForm
+from ..models import BoxGeometry, IsochroneBatchResult
+from .routing_queries import query_isochrone_origin, isochrone_feature_collection, geometry_to_geos
+
+# Rows are written in chunks while results stream in
+BATCH_PERSIST_CHUNK = 200
+
+
+def parse_batch_request(user, body: bytes, isochrone_params: dict) -> tuple:
+    """
+    Parse and validate the origins and parameter sets of a batch isochrone request.
+
+    The body is JSON with "origins" as [latitude, longitude] pairs and optional "params" as a
+    list of {"mode_selection", "buckets", "time_limit"} sets. Without "params", the user's
+    isochrone preferences are used.
+
+    Args:
+        user (User): The user sending the request.
+        body (bytes): The request body.
+        isochrone_params (dict): The user's isochrone preferences and routing target.
+
+    Returns:
+        tuple: The origins as (latitude, longitude) tuples and the validated parameter sets.
+
+    Raises:
+        ValidationError: If the request is malformed or too large.
+    """
+    try:
+        payload = json.loads(body)
+        origins = [(float(lat), float(lon)) for lat, lon in payload['origins']]
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError('Send a JSON body with "origins" as a list of [latitude, longitude] pairs.')
+
+    requested_params = payload.get('params')
+    if requested_params is not None and (
+            not isinstance(requested_params, list) or not all(isinstance(params, dict) for params in requested_params)):
+        raise ValidationError('Send "params" as a list of {"mode_selection", "buckets", "time_limit"} objects.')
+
+    param_sets = []
+    for params in requested_params or [{
+        'mode_selection': isochrone_params['mode_selection'],
+        'buckets': isochrone_params['buckets'],
+        'time_limit': isochrone_params['time_limit'],
+    }]:
+        form = IsochroneForm(data=params)
+        if not form.is_valid():
+            raise ValidationError(f"Invalid isochrone parameters {params}: {form.errors.as_text()}")
+        param_sets.append(form.cleaned_data)
+
+    if not origins:
+        raise ValidationError('No origins given.')
+    if len(origins) * len(param_sets) > settings.ISOCHRONE_BATCH_MAX_JOBS:
+        raise ValidationError(f"A batch can hold at most {settings.ISOCHRONE_BATCH_MAX_JOBS} origin and parameter combinations.")
+    if not BoxGeometry.objects.filter(user=user).exists():
+        raise ValidationError('You need to draw and upload a bounding box.')
+
+    return origins, param_sets
+
+
+def run_isochrone_query(isochrone_params: dict, params: dict, origin: tuple) -> tuple:
+    """
+    Run one isochrone query of a batch and time it.
+
+    Args:
+        isochrone_params (dict): The user's routing target.
+        params (dict): The parameter set of the query.
+        origin (tuple): The origin as (latitude, longitude).
+
+    Returns:
+        tuple: A boolean indicating success, the parsed polygons or an error dict, and the latency in ms.
+    """
+    started = time.monotonic()
+    success, result = query_isochrone_origin(
+        isochrone_params,
+        params['mode_selection'],
+        params['buckets'],
+        params['time_limit'],
+        f"{origin[0]},{origin[1]}"
+    )
+    return success, result, round((time.monotonic() - started) * 1000, 1)
+
+
+def run_isochrone_batch(user, isochrone_params: dict, origins: list, param_sets: list):
+    """
+    Query isochrones for many origins with bounded concurrency and yield results as they complete.
+
+    Origins outside the user's bounding box are reported as failures without querying the
+    routing pod. Successful results are stored in bulk as IsochroneBatchResult rows.
+
+    Args:
+        user (User): The user running the batch.
+        isochrone_params (dict): The user's routing target.
+        origins (list): The origins as (latitude, longitude) tuples.
+        param_sets (list): The validated parameter sets.
+
+    Yields:
+        dict: One event per origin and parameter set, followed by a summary event.
+    """
+    batch_id = uuid.uuid4()
+    started = time.monotonic()
+    boxes = [box.geom for box in BoxGeometry.objects.filter(user=user)]
+    summary = {'type': 'summary', 'batch_id': str(batch_id), 'total': len(origins) * len(param_sets), 'succeeded': 0, 'failed': 0}
+    pending_rows = []
+
+    def flush():
+        IsochroneBatchResult.objects.bulk_create(pending_rows)
+        pending_rows.clear()
+
+    # A client that disconnects closes the generator. Queries that have not started are then
+    # cancelled instead of run for nobody, and finished results are still stored.
+    executor = ThreadPoolExecutor(max_workers=settings.ISOCHRONE_BATCH_CONCURRENCY)
+    try:
+        futures = {}
+        for origin_index, origin in enumerate(origins):
+            point = Point(origin[1], origin[0], srid=4326)
+            for params_index, params in enumerate(param_sets):
+                job = {'type': 'result', 'origin_index': origin_index, 'params_index': params_index, 'origin': list(origin)}
+                if not any(point.within(box) for box in boxes):
+                    summary['failed'] += 1
+                    yield {**job, 'status': 'error', 'error': 'The origin is not within the bounding box.'}
+                    continue
+                futures[executor.submit(run_isochrone_query, isochrone_params, params, origin)] = (job, point, params)
+
+        for future in as_completed(futures):
+            job, point, params = futures[future]
+            try:
+                success, result, latency_ms = future.result()
+            except Exception as e:
+                success, result, latency_ms = False, {'error': f"Request failed: {e}"}, None
+
+            if not success:
+                summary['failed'] += 1
+                yield {**job, 'status': 'error', 'error': result.get('error'), 'latency_ms': latency_ms}
+                continue
+
+            summary['succeeded'] += 1
+            pending_rows.extend(
+                IsochroneBatchResult(
+                    user=user, batch_id=batch_id, origin_index=job['origin_index'], origin=point,
+                    mode_selection=params['mode_selection'], buckets=params['buckets'], time_limit=params['time_limit'],
+                    bucket=polygon['bucket'], geom=geometry_to_geos(polygon['geometry'])
+                )
+                for polygon in result
+            )
+            if len(pending_rows) >= BATCH_PERSIST_CHUNK:
+                flush()
+            yield {**job, 'status': 'ok', 'latency_ms': latency_ms, 'iso_json': isochrone_feature_collection(result)}
+        executor.shutdown()
+    except BaseException:  # Includes the GeneratorExit of a closed stream
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        flush()
+    summary['seconds'] = round(time.monotonic() - started, 2)
+    yield summary
@@ -0,0 +1,83 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# Origins are snapped to 4 decimal places (about 11 m), so nearby clicks share a result
+ORIGIN_DECIMALS = 4
+COALESCE_LOCK_TIMEOUT = 60  # seconds
+COALESCE_POLL_SECONDS = 0.2
+
+
+def snap_origin(point_coordinates: str) -> str:
+    """
+    Snap an origin to a small grid.
+
+    Args:
+        point_coordinates (str): The origin in "latitude,longitude" format.
+
+    Returns:
+        str: The snapped origin in the same format.
+    """
+    lat, lon = (float(value) for value in point_coordinates.split(','))
+    return f"{lat:.{ORIGIN_DECIMALS}f},{lon:.{ORIGIN_DECIMALS}f}"
+
+
+def get_isochrone_cache_key(artifact_hash: str, profile: str, buckets: int, time_limit: int, point_coordinates: str) -> str:
+    """
+    Build the cache key of an isochrone result.
+
+    The key includes the graph artifact, so a rebuilt graph never serves results of the old one.
+
+    Args:
+        artifact_hash (str): The content address of the graph that answers the query.
+        profile (str): The GraphHopper profile.
+        buckets (int): The number of time buckets.
+        time_limit (int): The time limit in seconds.
+        point_coordinates (str): The snapped origin in "latitude,longitude" format.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"isochrone:{artifact_hash}:{profile}:{buckets}:{time_limit}:{point_coordinates}"
+
+
+def get_or_fetch_isochrone(cache_key: str, fetch_fn) -> tuple:
+    """
+    Return a cached isochrone result, or fetch and cache it.
+
+    Identical requests in flight are coalesced: the first one takes a short lock in the cache
+    and fetches, and the others wait for its result instead of querying the routing pod too.
+
+    Args:
+        cache_key (str): The cache key of the result, or None to skip the cache.
+        fetch_fn: Called without arguments to fetch the result, returning (success, result).
+
+    Returns:
+        tuple: A boolean indicating success and the result or an error dict.
+    """
+    if cache_key is None:
+        return fetch_fn()
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return True, cached
+
+    lock_key = f"{cache_key}:lock"
+    if cache.add(lock_key, 1, timeout=COALESCE_LOCK_TIMEOUT):
+        try:
+            success, result = fetch_fn()
+            if success:
+                cache.set(cache_key, result, timeout=settings.ISOCHRONE_CACHE_TTL)
+            return success, result
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + COALESCE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(COALESCE_POLL_SECONDS)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return True, cached
+        if cache.get(lock_key) is None:
+            break  # The first request failed, so fetch independently
+    return fetch_fn()
@@ -0,0 +1,46 @@
+import time
+from django.core.exceptions import ValidationError
+
+from ..models import UserRoutingPod
+from .prepare_isochrone_data import check_marker_geometry, get_user_isochrone_preferences, prepare_marker_geodata
+from .routing_queries import query_isochrone_origin
+
+
+def precompute_user_isochrone(user) -> bool:
+    """
+    Compute the isochrones of a user's markers ahead of their request, so they land in the cache.
+
+    Only ready GraphHopper pods are queried: an idle pod is not woken up for a guess, and the
+    in-process engine answers fast enough without the cache. The queries go through the same
+    cache and request coalescing as create_isochrone, which then finds the results there.
+
+    Args:
+        user (User): The user whose markers were saved.
+
+    Returns:
+        bool: True if every marker's isochrone is now cached, otherwise False.
+    """
+    try:
+        check_marker_geometry(user)
+        isochrone_params = get_user_isochrone_preferences(user)
+        origins = prepare_marker_geodata(user)
+    except ValidationError:
+        return False
+    if isochrone_params['engine'] != UserRoutingPod.ENGINE_GRAPHHOPPER:
+        return False
+
+    started = time.monotonic()
+    for point_coordinates in origins:
+        success, result = query_isochrone_origin(
+            isochrone_params,
+            isochrone_params['mode_selection'],
+            isochrone_params['buckets'],
+            isochrone_params['time_limit'],
+            point_coordinates
+        )
+        if not success:
+            print(f"Isochrone precompute for user {user.id} stopped: {result.get('error')}")
+            return False
+
+    print(f"Precomputed {len(origins)} isochrone(s) for user {user.id} in {time.monotonic() - started:.2f}s.")
+    return True
@@ -0,0 +1,254 @@
+import os
+import threading
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from ..utils.graph_arrays import get_graph_arrays_path, load_graph_arrays
+from .graph_artifacts import get_user_files_dir
+
+MODES = ('car', 'bike', 'foot')
+# Modes that may only follow one-way streets in their direction, as in GraphHopper's profiles
+ONEWAY_MODES = ('car', 'bike')
+# Travel speeds in km/h per highway type and mode, None where the mode may not use the road
+HIGHWAY_SPEEDS = {
+    'motorway': (100, None, None),
+    'motorway_link': (60, None, None),
+    'trunk': (80, None, None),
+    'trunk_link': (50, None, None),
+    'primary': (65, 18, 5),
+    'primary_link': (40, 18, 5),
+    'secondary': (55, 18, 5),
+    'secondary_link': (40, 18, 5),
+    'tertiary': (40, 18, 5),
+    'tertiary_link': (30, 18, 5),
+    'unclassified': (30, 18, 5),
+    'residential': (30, 18, 5),
+    'living_street': (10, 18, 5),
+    'service': (15, 16, 5),
+    'road': (20, 16, 5),
+    'track': (15, 12, 5),
+    'cycleway': (None, 18, 5),
+    'path': (None, 12, 5),
+    'footway': (None, 6, 5),
+    'pedestrian': (None, 6, 5),
+    'bridleway': (None, None, 5),
+    'steps': (None, None, 3),
+}
+DEFAULT_SPEEDS = (None, 12, 5)
+# Cars rarely drive at the posted limit
+CAR_MAXSPEED_FACTOR = 0.9
+# Keeps zero-length edges from being dropped as missing edges by the sparse graph
+MIN_TRAVEL_SECONDS = 0.01
+
+# Origins further than this from any node are outside the network
+MAX_SNAP_METERS = 500
+CONCAVE_HULL_RATIO = 0.3
+# About 30 m, so a bucket that only reaches a node or a straight road still has an area
+POINT_BUFFER_DEGREES = 0.0003
+METERS_PER_DEGREE = 111320
+
+MAX_CACHED_GRAPHS = 16
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_local_graph_path(user_id: int) -> str:
+    """
+    Returns the path of the graph arrays the in-process engine routes on, next to the user's OSM file.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        str: The path of the graph arrays folder.
+    """
+    return get_graph_arrays_path(os.path.join(get_user_files_dir(), f"{user_id}.osm"))
+
+
+def get_edge_travel_times(graph: dict) -> dict:
+    """
+    Derive the travel time of each edge per mode from its highway and maxspeed tags.
+
+    Args:
+        graph (dict): The memory-mapped graph arrays.
+
+    Returns:
+        dict: The travel time of each edge in seconds per mode, inf where the mode may not use it.
+    """
+    # One row of speeds per highway tag in the graph, looked up by each edge's tag code
+    tag_speeds = np.array([
+        [np.nan if speed is None else speed for speed in HIGHWAY_SPEEDS.get(tag, DEFAULT_SPEEDS)]
+        for tag in graph['meta']['highway_tags']
+    ], dtype=np.float64).reshape(-1, len(MODES))
+    speeds = tag_speeds[graph['edge_highway']]
+
+    maxspeed = np.asarray(graph['edge_maxspeed'], dtype=np.float64)
+    car = MODES.index('car')
+    speeds[:, car] = np.where(np.isfinite(speeds[:, car]) & np.isfinite(maxspeed), maxspeed * CAR_MAXSPEED_FACTOR, speeds[:, car])
+
+    lengths = np.asarray(graph['edge_length'], dtype=np.float64)
+    travel_times = {}
+    for index, mode in enumerate(MODES):
+        mode_speeds = speeds[:, index]
+        usable = np.isfinite(mode_speeds) & (mode_speeds > 0)
+        travel_times[mode] = np.where(usable, lengths / np.where(usable, mode_speeds / 3.6, 1), np.inf)
+    return travel_times
+
+
+def project_coordinates(graph: dict, x, y) -> np.ndarray:
+    """
+    Project coordinates to meters around the graph's mean latitude, which is accurate enough
+    for snapping within a small network.
+
+    Args:
+        graph (dict): The loaded graph.
+        x: The longitudes.
+        y: The latitudes.
+
+    Returns:
+        np.ndarray: The projected coordinates as (x, y) rows.
+    """
+    return np.column_stack([np.asarray(x) * graph['x_scale'], np.asarray(y) * METERS_PER_DEGREE])
+
+
+def load_local_graph(graph_path: str) -> dict:
+    """
+    Load a user's graph arrays, reusing the copy in memory while the files are unchanged.
+
+    Args:
+        graph_path (str): The path of the graph arrays folder.
+
+    Returns:
+        dict: The memory-mapped arrays, a KD-tree of the nodes and the per-mode sparse graphs.
+    """
+    stat = os.stat(graph_path)
+    version = (stat.st_ino, stat.st_mtime)
+    with _graphs_lock:
+        graph = _graphs.get(graph_path)
+        if graph and graph['file_version'] == version:
+            return graph
+
+    graph = load_graph_arrays(graph_path)
+    graph['file_version'] = version
+    graph['x_scale'] = METERS_PER_DEGREE * np.cos(np.deg2rad(float(np.mean(graph['node_y']))))
+    graph['tree'] = cKDTree(project_coordinates(graph, graph['node_x'], graph['node_y']))
+    graph['csgraphs'] = {}
+
+    with _graphs_lock:
+        _graphs.pop(graph_path, None)
+        if len(_graphs) >= MAX_CACHED_GRAPHS:
+            _graphs.pop(next(iter(_graphs)))
+        _graphs[graph_path] = graph
+    return graph
+
+
+def get_mode_csgraph(graph: dict, mode: str) -> csr_matrix:
+    """
+    Get the compressed sparse graph of travel times for one mode.
+
+    Args:
+        graph (dict): The loaded graph.
+        mode (str): The transport mode.
+
+    Returns:
+        csr_matrix: The travel times in seconds between connected nodes.
+    """
+    if mode in graph['csgraphs']:
+        return graph['csgraphs'][mode]
+
+    times = get_edge_travel_times(graph)[mode]
+    node_count = graph['meta']['node_count']
+    src = np.repeat(np.arange(node_count, dtype=np.int32), np.diff(graph['indptr']))
+    dst = np.asarray(graph['indices'])
+    usable = np.isfinite(times)
+    two_way = usable & ~np.asarray(graph['edge_oneway']) if mode in ONEWAY_MODES else usable
+    rows = np.concatenate([src[usable], dst[two_way]])
+    cols = np.concatenate([dst[usable], src[two_way]])
+    weights = np.maximum(np.concatenate([times[usable], times[two_way]]), MIN_TRAVEL_SECONDS)
+
+    # csr_matrix sums parallel edges, so only the fastest one between two nodes is kept
+    order = np.lexsort((weights, cols, rows))
+    rows, cols, weights = rows[order], cols[order], weights[order]
+    fastest = np.ones(len(rows), dtype=bool)
+    fastest[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+
+    csgraph = csr_matrix((weights[fastest], (rows[fastest], cols[fastest])), shape=(node_count, node_count))
+    graph['csgraphs'][mode] = csgraph
+    return csgraph
+
+
+def snap_to_nodes(graph: dict, lats, lons) -> np.ndarray:
+    """
+    Find the node nearest to each point.
+
+    Args:
+        graph (dict): The loaded graph.
+        lats: The latitudes of the points.
+        lons: The longitudes of the points.
+
+    Returns:
+        np.ndarray: The node index of each point, or -1 where it is too far from the network.
+    """
+    distances, nodes = graph['tree'].query(project_coordinates(graph, lons, lats))
+    return np.where(distances <= MAX_SNAP_METERS, nodes, -1)
+
+
+def bucket_polygon(x: np.ndarray, y: np.ndarray):
+    """
+    Build the polygon around the nodes reached within a bucket.
+
+    Args:
+        x (np.ndarray): The longitudes of the reached nodes.
+        y (np.ndarray): The latitudes of the reached nodes.
+
+    Returns:
+        shapely.Polygon: The concave hull of the nodes.
+    """
+    hull = shapely.concave_hull(shapely.multipoints(np.column_stack([x, y])), ratio=CONCAVE_HULL_RATIO)
+    if hull.geom_type != 'Polygon':
+        hull = hull.buffer(POINT_BUFFER_DEGREES)  # A single node or nodes along a straight road
+    return hull
+
+
+def local_isochrone_query(graph_path: str, transport_mode: str, bucket_num: int, time: int, point_coordinates: str) -> tuple:
+    """
+    Compute an isochrone in-process with bucketed Dijkstra from the node nearest to the origin.
+
+    The result has the same form as a GraphHopper isochrone query, with bucket 0 the area
+    reached within the first time step.
+
+    Args:
+        graph_path (str): The path of the user's graph arrays folder.
+        transport_mode (str): Mode of transport for the isochrone query.
+        bucket_num (int): Number of time buckets for the isochrone query.
+        time (int): Time limit for the isochrone query in minutes.
+        point_coordinates (str): Coordinates of the starting point for the isochrone query.
+
+    Returns:
+        tuple: A boolean indicating success and the isochrone polygons or an error dict.
+    """
+    if transport_mode not in MODES:
+        return False, {"error": f"Unknown transport mode: {transport_mode}"}
+    try:
+        graph = load_local_graph(graph_path)
+    except (OSError, ValueError):
+        return False, {"error": "Your network has not been prepared yet. Please build it and try again."}
+
+    lat, lon = (float(value) for value in point_coordinates.split(','))
+    source = snap_to_nodes(graph, [lat], [lon])[0]
+    if source < 0:
+        return False, {"error": "The point is too far from the road network."}
+
+    time_limit = time * 60  # Convert minutes to seconds
+    travel_times = dijkstra(get_mode_csgraph(graph, transport_mode), directed=True, indices=source, limit=time_limit)
+
+    polygons = []
+    for bucket in range(bucket_num):
+        reached = travel_times <= time_limit * (bucket + 1) / bucket_num
+        polygons.append({'bucket': bucket, 'geometry': mapping(bucket_polygon(graph['node_x'][reached], graph['node_y'][reached]))})
+    return True, polygons
@@ -1,6 +1,5 @@
 import json
 import os
-import shutil
 import geopandas as gpd
 from shapely.geometry import shape
 from django.contrib.auth.models import User
@@ -163,10 +162,29 @@ def get_geodata_gdfs(user: User) -> tuple:
     return gdf_qs, gdf_drawn
 
 
+def get_box_gdf(user: User) -> gpd.GeoDataFrame:
+    """
+    Converts the user's BoxGeometry to a GeoDataFrame.
+
+    Args:
+        user (User): The user whose bounding box is to be converted.
+
+    Returns:
+        gpd.GeoDataFrame: The bounding box, or None if the user has not drawn one.
+    """
+    box = BoxGeometry.objects.filter(user=user).order_by('-id').first()
+    if not box:
+        return None
+    return gpd.GeoDataFrame(geometry=[shape(json.loads(box.geom.geojson))], crs='EPSG:4326')
+
+
 def prepare_folders(user_id: int) -> tuple:
     """
     Prepares the folders and file paths for the user's data.
 
+    The YAML file is written later by the GraphHopper config generator, once the size of
+    the user's graph is known.
+
     Args:
         user_id (int): The ID of the user.
 
@@ -184,7 +202,4 @@ def prepare_folders(user_id: int) -> tuple:
     output_osm_path = os.path.join(osm_folder, f"{user_id}.osm")
     output_yaml_path = os.path.join(yaml_folder, f"{user_id}.yaml")
 
-    master_yaml_path = os.path.join(yaml_folder, 'master.yaml')
-    shutil.copyfile(master_yaml_path, output_yaml_path)
-
     return output_osm_path, output_yaml_path
\ No newline at end of file
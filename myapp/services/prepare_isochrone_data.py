@@ -1,9 +1,12 @@
 import json
 import geopandas as gpd
 from shapely.geometry import shape
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.contrib.gis.geos import GEOSGeometry
 from ..models import BoxGeometry, MarkerGeometry, IsochronePreferences, UserRoutingPod
+from .routing_pod_status import get_routing_base_url
+from .local_routing import get_local_graph_path
 
 
 def check_marker_geometry(user) -> bool:
@@ -37,32 +40,46 @@ def get_user_isochrone_preferences(user) -> dict:
         user (User): The user for whom to retrieve isochrone preferences.
 
     Returns:
-        dict: A dictionary containing the user's mode selection, buckets, and time limit.
+        dict: A dictionary containing the user's mode selection, buckets, and time limit, and the routing engine to query.
     """
     user_preferences = IsochronePreferences.objects.filter(user=user).first()
     if not user_preferences:
         raise ValidationError("No mode selected. Please select a transport mode, buckets and time limit and submit.")
     
-    user_pod = UserRoutingPod.objects.get(user=user)
-    
-    return {
+    isochrone_params = {
         'mode_selection': user_preferences.mode_selection,
         'buckets': user_preferences.buckets,
-        'time_limit': user_preferences.time_limit,
-        'port': user_pod.service_name
+        'time_limit': user_preferences.time_limit
+    }
+
+    user_pod = UserRoutingPod.objects.filter(user=user).first()
+    if user_pod and user_pod.engine == UserRoutingPod.ENGINE_LOCAL:
+        # Small networks are routed in-process, without a routing pod or the isochrone cache
+        return {**isochrone_params, 'engine': user_pod.engine, 'graph_path': get_local_graph_path(user.id),
+                'base_url': None, 'artifact_hash': None}
+
+    base_url = get_routing_base_url(user_pod) if user_pod else None
+    if not base_url or user_pod.routing_status != UserRoutingPod.STATUS_READY:
+        raise ValidationError("The routing engine is still loading your network. Please wait until it is ready and try again.")
+
+    return {
+        **isochrone_params,
+        'engine': user_pod.engine,
+        'base_url': base_url,
+        'artifact_hash': user_pod.active_artifact_hash or user_pod.artifact_hash
     }
 
-def prepare_marker_geodata(user) -> str:
+def prepare_marker_geodata(user) -> list:
     """
-    Prepares the marker GeoDataFrame and retrieves the coordinates of the first point.
+    Prepares the marker GeoDataFrame and retrieves the coordinates of every point.
 
     Args:
         user (User): The user for whom to prepare the marker GeoDataFrame.
 
     Returns:
-        str: The coordinates of the first point as a string in "latitude,longitude" format.
+        list: The coordinates of each point as a string in "latitude,longitude" format.
     """
-    marker_geom = MarkerGeometry.objects.filter(user=user)
+    marker_geom = MarkerGeometry.objects.filter(user=user).order_by('id')
     geodata_dicts_marker = list(marker_geom.values())
 
     for item in geodata_dicts_marker:
@@ -71,5 +88,6 @@ def prepare_marker_geodata(user) -> str:
 
     gdf_marker = gpd.GeoDataFrame(geodata_dicts_marker, crs='4326', geometry='geom')
     gdf_marker = gdf_marker.rename_geometry('geometry')
-    first_point = gdf_marker.geometry.iloc[0]
-    return f"{first_point.y},{first_point.x}"
\ No newline at end of file
+    if len(gdf_marker) > settings.ISOCHRONE_MAX_ORIGINS:
+        raise ValidationError(f"Isochrones can be combined for at most {settings.ISOCHRONE_MAX_ORIGINS} points. Please remove some markers.")
+    return [f"{y},{x}" for x, y in zip(gdf_marker.geometry.x, gdf_marker.geometry.y)]
@@ -1,5 +1,6 @@
 import json
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.http import HttpResponse, HttpRequest
@@ -8,6 +9,7 @@ from django.contrib.gis.geos import GEOSGeometry
 
 from ..forms import NetworkTypeForm, GeoJSONUploadForm, IsochroneForm 
 from ..models import GeoData, BoxGeometry, MarkerGeometry, IsochronePreferences, Isochrone, NetworkType
+from ..tasks import precompute_isochrone, prefetch_box_network
 
 def fetch_preferences(user: User) -> tuple:
     """
@@ -62,10 +64,10 @@ def fetch_latest_geometries(user: User) -> tuple:
         user (User): The user whose latest geometries are to be fetched.
 
     Returns:
-        tuple: A tuple containing the latest drawn geometry, marker geometry, and isochrone geometries.
+        tuple: A tuple containing the latest drawn geometry, marker geometries, and isochrone geometries.
     """
     latest_drawn_geometry_query = BoxGeometry.objects.filter(user=user).order_by('-id').first()
-    latest_marker_geometry_query = MarkerGeometry.objects.filter(user=user).order_by('-id').first()
+    latest_marker_geometry_query = MarkerGeometry.objects.filter(user=user)
     latest_isochrone_geometry = Isochrone.objects.filter(user=user)
     return latest_drawn_geometry_query, latest_marker_geometry_query, latest_isochrone_geometry
 
@@ -134,6 +136,9 @@ def process_drawn_geometry(request: HttpRequest) -> bool:
             geom = GEOSGeometry(json.dumps(drawn_data['geometry']))
             BoxGeometry.objects.filter(user=request.user).delete()
             BoxGeometry.objects.create(user=request.user, geom=geom)
+            if settings.OSM_PREFETCH_ENABLED:
+                # Download the base network while the user prepares the rest of their inputs
+                prefetch_box_network.delay(request.user.id)
             return True
         except json.JSONDecodeError:
             messages.error(request, 'Invalid box data')
@@ -147,6 +152,8 @@ def process_marker_data(request: HttpRequest) -> bool:
     """
     Processes marker data submitted via a form.
 
+    The marker data is a GeoJSON Point, or a MultiPoint for isochrones from several origins.
+
     Args:
         request (HttpRequest): The HTTP request containing the marker data.
 
@@ -160,8 +167,13 @@ def process_marker_data(request: HttpRequest) -> bool:
             if not marker_json.get('geometry'):
                 return HttpResponse('Empty marker data', status=400)
             geom = GEOSGeometry(json.dumps(marker_json['geometry']))
+            # A MultiPoint holds several origins, which are stored as one marker each
+            points = list(geom) if geom.geom_type == 'MultiPoint' else [geom]
             MarkerGeometry.objects.filter(user=request.user).delete()
-            MarkerGeometry.objects.create(user=request.user, geom=geom)
+            MarkerGeometry.objects.bulk_create([MarkerGeometry(user=request.user, geom=point) for point in points])
+            if settings.ISOCHRONE_PRECOMPUTE:
+                # Warm the isochrone cache, so the user's next isochrone request is answered from it
+                precompute_isochrone.delay(request.user.id)
             return True
         except json.JSONDecodeError:
             messages.error(request, 'Invalid point data')
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 2  # seconds
+READ_TIMEOUT = 30  # seconds
+REQUEST_DEADLINE = 45  # seconds across all attempts
+BACKOFF_BASE = 0.25  # seconds before the first retry
+BACKOFF_MAX = 4  # seconds
+RETRY_STATUS_CODES = {502, 503, 504}
+POOL_MAXSIZE = 16
+# Pod IPs change as pods come and go, so only the most recent clients are kept
+MAX_POD_CLIENTS = 256
+
+# Consecutive failed requests, each after all its retries, after which a pod is considered down, and for how long
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30  # seconds
+
+
+class RoutingUnavailable(Exception):
+    """Raised when a GraphHopper pod cannot be reached before the deadline."""
+
+
+class CircuitBreaker:
+    """
+    Fails requests to a pod fast after repeated failures, then lets a single trial request
+    through once the cooldown has passed.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial_in_flight and time.monotonic() - self.opened_at >= self.cooldown:
+                # Half-open: only this request tries, the others fail fast until it has finished
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+_sessions = {}
+_breakers = {}
+_clients_lock = threading.Lock()
+
+
+def get_pod_client(base_url: str) -> tuple:
+    """
+    Get the pooled keep-alive session and circuit breaker for a GraphHopper pod.
+
+    Args:
+        base_url (str): The base URL of the pod or its service.
+
+    Returns:
+        tuple: The requests Session and the CircuitBreaker of the pod.
+    """
+    with _clients_lock:
+        if base_url not in _sessions:
+            if len(_sessions) >= MAX_POD_CLIENTS:
+                oldest = next(iter(_sessions))
+                _sessions.pop(oldest).close()
+                _breakers.pop(oldest)
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE))
+            _sessions[base_url] = session
+            _breakers[base_url] = CircuitBreaker()
+        return _sessions[base_url], _breakers[base_url]
+
+
+def get_backoff(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): The number of attempts made so far.
+
+    Returns:
+        float: The number of seconds to wait before the next attempt.
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def routing_get(base_url: str, path: str, params: dict, deadline: float = REQUEST_DEADLINE) -> requests.Response:
+    """
+    Send a GET request to a GraphHopper pod with timeouts, retries and a circuit breaker.
+
+    Connection errors, connect timeouts and gateway errors are retried with backoff until the
+    deadline. Read timeouts and other request errors fail straight away. Any other response,
+    including client errors, is returned to the caller.
+
+    Args:
+        base_url (str): The base URL of the pod or its service.
+        path (str): The path of the endpoint, e.g. '/isochrone'.
+        params (dict): The query parameters.
+        deadline (float): The overall time budget for all attempts in seconds.
+
+    Returns:
+        requests.Response: The response of the pod.
+
+    Raises:
+        RoutingUnavailable: If the pod is known to be down, did not answer in time or the request failed.
+    """
+    session, breaker = get_pod_client(base_url)
+    if not breaker.allow_request():
+        raise RoutingUnavailable("The routing engine is not responding. Please try again shortly.")
+
+    give_up_at = time.monotonic() + deadline
+    attempt = 0
+    try:
+        while True:
+            remaining = give_up_at - time.monotonic()
+            try:
+                response = session.get(
+                    f"{base_url}{path}", params=params,
+                    timeout=(CONNECT_TIMEOUT, max(0.1, min(READ_TIMEOUT, remaining)))
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                error = f"status {response.status_code}"
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout: the request never reached the pod, so it is safe to retry
+                error = str(e)
+            except requests.RequestException as e:
+                # A read timeout means the pod is still computing, so retrying would only add load,
+                # and broken or redirected responses would fail again
+                breaker.record_failure()
+                print(f"Routing request to {base_url}{path} failed: {e}")
+                raise RoutingUnavailable("The routing request failed. Please try again later.") from e
+
+            attempt += 1
+            wait = get_backoff(attempt)
+            if time.monotonic() + wait >= give_up_at:
+                break
+            time.sleep(wait)
+    except RoutingUnavailable:
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    # One failure per call, so the retries of a single request cannot open the breaker
+    breaker.record_failure()
+    print(f"Routing request to {base_url}{path} failed after {attempt} attempts: {error}")
+    raise RoutingUnavailable("Connection failed after retrying. Please try again later.")
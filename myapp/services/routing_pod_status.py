@@ -0,0 +1,436 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from kubernetes import client, watch
+from kubernetes.client.rest import ApiException
+from django.http import HttpRequest
+from django.utils import timezone
+
+from ..models import BoxGeometry, IsochronePreferences, UserRoutingPod
+from .create_routing_pod import load_kube_config
+from .routing_client import routing_get
+
+ROUTING_POD_SELECTOR = "app=graphhopper"
+ROUTING_PORT = 8989
+
+# Set on a pod once its warm-up queries have run, with their total time in ms
+WARMUP_ANNOTATION = "isochrone/warmup-ms"
+WARMUP_WORKERS = 4
+WARMUP_DEADLINE = 60  # seconds per warm-up query
+WARMUP_PATCH_ATTEMPTS = 5
+# Warm-up origins lie on a ring this far from the box's centroid, as a fraction of the box size
+WARMUP_RING_FRACTION = 0.25
+
+_warming_pods = set()
+_warming_lock = threading.Lock()
+
+
+def get_pod_routing_status(pod: client.V1Pod) -> str:
+    """
+    Derive the routing status of a GraphHopper pod.
+
+    A pod in the "Running" phase is still importing or loading its graph until its readiness
+    probe against the GraphHopper health check passes. With warm-up queries configured, it is
+    only ready once they have run and been recorded on the pod.
+
+    Args:
+        pod (client.V1Pod): The pod to inspect.
+
+    Returns:
+        str: One of "pending", "importing", "ready" or "stopped".
+    """
+    if pod.metadata.deletion_timestamp or pod.status.phase in ("Succeeded", "Failed"):
+        return UserRoutingPod.STATUS_STOPPED
+    if pod.status.phase != "Running":
+        return UserRoutingPod.STATUS_PENDING
+    if not is_pod_loaded(pod):
+        return UserRoutingPod.STATUS_IMPORTING
+    if settings.ROUTING_WARMUP_QUERIES and get_pod_warmup_ms(pod) is None:
+        return UserRoutingPod.STATUS_IMPORTING  # Loaded, but the JVM is still being warmed up
+    return UserRoutingPod.STATUS_READY
+
+
+def is_pod_loaded(pod: client.V1Pod) -> bool:
+    """
+    Check if a GraphHopper pod's readiness probe against the health check passes.
+
+    Args:
+        pod (client.V1Pod): The pod to inspect.
+
+    Returns:
+        bool: True if the pod has loaded its graph, otherwise False.
+    """
+    for condition in pod.status.conditions or []:
+        if condition.type == "Ready" and condition.status == "True":
+            return True
+    return False
+
+
+def get_pod_warmup_ms(pod: client.V1Pod) -> float:
+    """
+    Get the warm-up time recorded on a GraphHopper pod.
+
+    Args:
+        pod (client.V1Pod): The pod to inspect.
+
+    Returns:
+        float: The total time of the warm-up queries in ms, or None if the pod has not been warmed up.
+    """
+    value = (pod.metadata.annotations or {}).get(WARMUP_ANNOTATION)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def get_pod_user_id(pod: client.V1Pod):
+    """
+    Get the user ID a GraphHopper pod belongs to from its labels.
+
+    Args:
+        pod (client.V1Pod): The pod to inspect.
+
+    Returns:
+        int: The user ID, or None if the pod is not labelled with one.
+    """
+    user_label = (pod.metadata.labels or {}).get("user")
+    return int(user_label) if user_label and user_label.isdigit() else None
+
+
+def record_pod_status(event_type: str, pod: client.V1Pod, known_statuses: dict):
+    """
+    Write the status of a GraphHopper pod to its user's UserRoutingPod row.
+
+    The update is conditional, so rows are only written when the status or pod IP actually
+    changed. Only pods in the slot the user's service routes to are written, so a blue/green standby
+    pod does not hide the pod that is still serving.
+
+    Args:
+        event_type (str): The watch event type ('ADDED', 'MODIFIED' or 'DELETED').
+        pod (client.V1Pod): The pod the event is about.
+        known_statuses (dict): The last seen (pod name, status) per user ID and slot, updated in place.
+    """
+    user_id = get_pod_user_id(pod)
+    if user_id is None:
+        return
+
+    slot = (pod.metadata.labels or {}).get("slot", "")
+    pod_name = pod.metadata.name
+    if event_type == "DELETED":
+        routing_status = UserRoutingPod.STATUS_STOPPED
+    else:
+        routing_status = get_pod_routing_status(pod)
+
+    # A pod being replaced during a rollout must not overwrite the status of its replacement
+    tracked_pod_name = known_statuses.get((user_id, slot), (None, None))[0]
+    if routing_status == UserRoutingPod.STATUS_STOPPED and tracked_pod_name not in (None, pod_name):
+        return
+
+    pod_ip = pod.status.pod_ip if routing_status != UserRoutingPod.STATUS_STOPPED else None
+    known_statuses[(user_id, slot)] = (pod_name, routing_status)
+    user_pods = UserRoutingPod.objects.filter(
+        user_id=user_id, active_slot=slot, engine=UserRoutingPod.ENGINE_GRAPHHOPPER
+    ).exclude(pod_name=pod_name, routing_status=routing_status, pod_ip=pod_ip)
+    if routing_status == UserRoutingPod.STATUS_STOPPED:
+        # Keep a failed build visible to the user after its old pod is removed
+        user_pods = user_pods.exclude(routing_status=UserRoutingPod.STATUS_FAILED)
+    fields = {
+        'pod_name': pod_name,
+        'pod_ip': pod_ip,
+        'routing_status': routing_status,
+        'button_activate': routing_status == UserRoutingPod.STATUS_READY
+    }
+    if routing_status == UserRoutingPod.STATUS_READY:
+        fields['warmup_ms'] = get_pod_warmup_ms(pod)
+    updated = user_pods.update(**fields)
+    if updated:
+        print(f"Pod {pod_name} for user {user_id} is {routing_status}.")
+
+
+def get_warmup_points(user_id: int, count: int) -> list:
+    """
+    Get the origins of the warm-up queries: the centroid of the user's box and a ring around it.
+
+    Args:
+        user_id (int): The ID of the user whose graph the pod serves.
+        count (int): The number of origins.
+
+    Returns:
+        list: The origins in "latitude,longitude" format, or an empty list without a box.
+    """
+    box = BoxGeometry.objects.filter(user_id=user_id).first()
+    if not box:
+        return []
+    west, south, east, north = box.geom.extent
+    center = box.geom.centroid
+    points = [f"{center.y},{center.x}"]
+    for index in range(count - 1):
+        angle = 2 * math.pi * index / (count - 1)
+        lat = center.y + math.sin(angle) * (north - south) * WARMUP_RING_FRACTION
+        lon = center.x + math.cos(angle) * (east - west) * WARMUP_RING_FRACTION
+        points.append(f"{lat},{lon}")
+    return points
+
+
+def warm_up_pod(core_v1_api: client.CoreV1Api, pod_name: str, pod_ip: str, user_id: int, namespace: str):
+    """
+    Run warm-up isochrone queries against a freshly loaded pod and record their time on it.
+
+    The first queries against a new JVM are slow while it compiles hot code and pages in the
+    graph. Running them here means the user's first queries hit a warm pod. The annotation
+    written at the end marks the pod as ready, which the watcher then picks up.
+
+    Args:
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        pod_name (str): The name of the pod.
+        pod_ip (str): The IP of the pod.
+        user_id (int): The ID of the user whose graph the pod serves.
+        namespace (str): The namespace of the pod.
+    """
+    latencies = []
+    started = time.monotonic()
+    try:
+        preferences = IsochronePreferences.objects.filter(user_id=user_id).first()
+        params = {
+            "profile": preferences.mode_selection if preferences else "foot",
+            "buckets": preferences.buckets if preferences else 1,
+            "time_limit": (preferences.time_limit if preferences else 10) * 60
+        }
+        for point in get_warmup_points(user_id, settings.ROUTING_WARMUP_QUERIES):
+            query_started = time.monotonic()
+            routing_get(f"http://{pod_ip}:{ROUTING_PORT}", "/isochrone", {**params, "point": point}, deadline=WARMUP_DEADLINE)
+            latencies.append(round((time.monotonic() - query_started) * 1000))
+    except Exception as e:
+        # A failed warm-up must not keep the pod from ever becoming ready
+        print(f"Warm-up of pod {pod_name} stopped after {len(latencies)} queries: {e}")
+    warmup_ms = round((time.monotonic() - started) * 1000, 1)
+    print(f"Pod {pod_name} warmed up in {warmup_ms} ms, query latencies {latencies} ms.")
+
+    try:
+        for attempt in range(WARMUP_PATCH_ATTEMPTS):
+            try:
+                core_v1_api.patch_namespaced_pod(
+                    name=pod_name, namespace=namespace, body={"metadata": {"annotations": {WARMUP_ANNOTATION: str(warmup_ms)}}}
+                )
+                return
+            except ApiException as e:
+                if e.status == 404:
+                    return
+                print(f"Exception when recording the warm-up of pod {pod_name}: {e}")
+            except Exception as e:
+                print(f"Error when recording the warm-up of pod {pod_name}: {e}")
+            time.sleep(2 ** attempt)
+    finally:
+        with _warming_lock:
+            _warming_pods.discard(pod_name)
+
+
+def schedule_pod_warmup(executor: ThreadPoolExecutor, core_v1_api: client.CoreV1Api, pod: client.V1Pod, namespace: str):
+    """
+    Start warming up a pod that has loaded its graph but has not been warmed up yet.
+
+    Warm-ups run on a small thread pool, so they do not hold up the watch of other pods.
+
+    Args:
+        executor (ThreadPoolExecutor): The thread pool running warm-ups.
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        pod (client.V1Pod): The pod the event is about.
+        namespace (str): The namespace of the pod.
+    """
+    user_id = get_pod_user_id(pod)
+    if (not settings.ROUTING_WARMUP_QUERIES or user_id is None or pod.metadata.deletion_timestamp or
+            pod.status.phase != "Running" or not is_pod_loaded(pod) or get_pod_warmup_ms(pod) is not None):
+        return
+
+    pod_name = pod.metadata.name
+    with _warming_lock:
+        if pod_name in _warming_pods:
+            return
+        _warming_pods.add(pod_name)
+    executor.submit(warm_up_pod, core_v1_api, pod_name, pod.status.pod_ip, user_id, namespace)
+
+
+def sync_routing_pod_statuses(core_v1_api: client.CoreV1Api, namespace: str, known_statuses: dict,
+                              warmup_executor: ThreadPoolExecutor) -> str:
+    """
+    List every GraphHopper pod once and bring the cached statuses in line with the cluster.
+
+    Users whose pods no longer exist are marked as stopped, unless they are routed in-process.
+
+    Args:
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        namespace (str): The namespace of the GraphHopper pods.
+        known_statuses (dict): The last seen (pod name, status) per user ID and slot, updated in place.
+        warmup_executor (ThreadPoolExecutor): The thread pool running pod warm-ups.
+
+    Returns:
+        str: The resource version to start watching from.
+    """
+    pod_list = core_v1_api.list_namespaced_pod(namespace=namespace, label_selector=ROUTING_POD_SELECTOR)
+
+    known_statuses.clear()
+    for pod in pod_list.items:
+        record_pod_status("ADDED", pod, known_statuses)
+        schedule_pod_warmup(warmup_executor, core_v1_api, pod, namespace)
+
+    user_ids = {user_id for user_id, _ in known_statuses}
+    UserRoutingPod.objects.exclude(user_id__in=user_ids).exclude(
+        routing_status__in=[UserRoutingPod.STATUS_STOPPED, UserRoutingPod.STATUS_FAILED]
+    ).exclude(engine=UserRoutingPod.ENGINE_LOCAL).update(routing_status=UserRoutingPod.STATUS_STOPPED, button_activate=False, pod_ip=None)
+
+    return pod_list.metadata.resource_version
+
+
+def watch_routing_pods(namespace: str = "default", timeout_seconds: int = 300):
+    """
+    Track every GraphHopper pod in the cluster from a single watch and cache their statuses.
+
+    This is meant to run in one long-lived process. Views then read UserRoutingPod instead of
+    opening their own connections to the Kubernetes API.
+
+    Args:
+        namespace (str): The namespace of the GraphHopper pods.
+        timeout_seconds (int): How long each watch request stays open before it is renewed.
+    """
+    load_kube_config()
+    core_v1_api = client.CoreV1Api()
+    known_statuses = {}
+    resource_version = None
+    warmup_executor = ThreadPoolExecutor(max_workers=WARMUP_WORKERS)
+
+    while True:
+        try:
+            if resource_version is None:
+                resource_version = sync_routing_pod_statuses(core_v1_api, namespace, known_statuses, warmup_executor)
+
+            w = watch.Watch()
+            for event in w.stream(core_v1_api.list_namespaced_pod, namespace=namespace,
+                                  label_selector=ROUTING_POD_SELECTOR, resource_version=resource_version,
+                                  timeout_seconds=timeout_seconds):
+                if event['type'] == 'ERROR':
+                    # The object is a raw Status dict here, so list again rather than parse it
+                    print(f"Pod watch error, resyncing routing pod statuses: {event['raw_object']}")
+                    resource_version = None
+                    break
+                if event['type'] not in ('ADDED', 'MODIFIED', 'DELETED'):
+                    continue
+                pod = event['object']
+                resource_version = pod.metadata.resource_version
+                record_pod_status(event['type'], pod, known_statuses)
+                schedule_pod_warmup(warmup_executor, core_v1_api, pod, namespace)
+        except ApiException as e:
+            if e.status == 410:  # Resource version too old, so list again
+                print("Pod watch expired, resyncing routing pod statuses.")
+            else:
+                print(f"Exception when watching routing pods: {e}")
+                time.sleep(5)
+            resource_version = None
+        except Exception as e:
+            # A dropped stream or a database restart must not take down the watcher and its warm-ups
+            print(f"Error when watching routing pods: {e}")
+            close_old_connections()
+            time.sleep(5)
+            resource_version = None
+
+
+def wait_for_routing_ready(user_id: int, timeout_seconds: int = 300, poll_seconds: float = 2) -> bool:
+    """
+    Wait for the cached status of a user's routing pod to become ready.
+
+    Args:
+        user_id (int): The ID of the user whose pod is waited on.
+        timeout_seconds (int): How long to wait before giving up.
+        poll_seconds (float): How often to read the cached status.
+
+    Returns:
+        bool: True if the pod became ready, False otherwise.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        routing_status = UserRoutingPod.objects.filter(user_id=user_id).values_list('routing_status', flat=True).first()
+        if routing_status == UserRoutingPod.STATUS_READY:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_seconds)
+
+
+def is_user_pod_running(user_id: int, request: HttpRequest, timeout_immediately: bool) -> bool:
+    """
+    Checks if a pod associated with a user is ready to serve isochrones.
+
+    The status is read from UserRoutingPod, which the routing pod watcher keeps up to date,
+    so this never calls the Kubernetes API. It can either return immediately or wait for up
+    to 5 minutes for the pod to become ready.
+
+    Args:
+        user_id (int): The ID of the user whose pod status is being checked.
+        request (HttpRequest): The Django HTTP request object.
+        timeout_immediately (bool): If True, the function returns the current status straight away;
+                                    if False, it will wait for up to 5 minutes.
+
+    Returns:
+        bool: True if the pod is ready, False otherwise.
+    """
+    timeout_seconds = 0 if timeout_immediately else 300  # Immediately or 5 minutes
+    return wait_for_routing_ready(user_id, timeout_seconds=timeout_seconds)
+
+
+def mark_routing_pod_used(user_id: int) -> bool:
+    """
+    Record routing traffic for a user and scale their pod back up if it was idle.
+
+    Args:
+        user_id (int): The ID of the user whose pod is used.
+
+    Returns:
+        bool: True if the pod was idle and is now being resumed, otherwise False.
+    """
+    now = timezone.now()
+    resumed = UserRoutingPod.objects.filter(user_id=user_id, desired_state=UserRoutingPod.DESIRED_IDLE).update(
+        desired_state=UserRoutingPod.DESIRED_RUNNING, last_used_at=now
+    )
+    if resumed:
+        print(f"Resuming idle routing pod for user {user_id}.")
+        return True
+    UserRoutingPod.objects.filter(user_id=user_id, desired_state=UserRoutingPod.DESIRED_RUNNING).update(last_used_at=now)
+    return False
+
+
+def is_routing_pod_starting(user_id: int) -> bool:
+    """
+    Check if a user's routing pod has been requested but cannot serve isochrones yet.
+
+    Args:
+        user_id (int): The ID of the user whose pod is checked.
+
+    Returns:
+        bool: True if the pod is still starting, importing or warming up, otherwise False.
+    """
+    return UserRoutingPod.objects.filter(
+        user_id=user_id,
+        engine=UserRoutingPod.ENGINE_GRAPHHOPPER,
+        desired_state=UserRoutingPod.DESIRED_RUNNING,
+        routing_status__in=[UserRoutingPod.STATUS_PENDING, UserRoutingPod.STATUS_IMPORTING]
+    ).exists()
+
+
+def get_routing_base_url(user_pod: UserRoutingPod) -> str:
+    """
+    Get the URL isochrone requests for a user are sent to.
+
+    With the shared headless Service, requests go straight to the pod IP the watcher recorded.
+    Otherwise they go through the user's own Service.
+
+    Args:
+        user_pod (UserRoutingPod): The user's routing state.
+
+    Returns:
+        str: The base URL of the user's GraphHopper pod, or None if its address is not known yet.
+    """
+    if settings.ROUTING_SHARED_SERVICE:
+        return f"http://{user_pod.pod_ip}:{ROUTING_PORT}" if user_pod.pod_ip else None
+    return f"http://{user_pod.service_name}.default.svc.cluster.local:{ROUTING_PORT}"
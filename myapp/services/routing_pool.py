@@ -0,0 +1,145 @@
+import os
+from django.conf import settings
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from ..models import UserRoutingPod
+from .create_routing_pod import estimate_graph_memory_mb, get_routing_labels
+from .graph_artifacts import get_user_files_dir
+
+# Pool pods are labelled pool=waiting until they are claimed, then pool=claimed
+POOL_LABEL_SELECTOR = "pool"
+POOL_WAITING = "waiting"
+POOL_CLAIMED = "claimed"
+POOL_CLAIMS_FOLDER = "pool_claims"
+ARTIFACT_ANNOTATION = "isochrone/graph-artifact"
+
+
+def get_pool_claim_path(pod_name: str) -> str:
+    """
+    Returns the path of the claim file a waiting pool pod polls for.
+
+    Args:
+        pod_name (str): The name of the pool pod.
+
+    Returns:
+        str: The path of the claim file on the shared volume.
+    """
+    return os.path.join(get_user_files_dir(), POOL_CLAIMS_FOLDER, pod_name)
+
+
+def list_pool_pods(core_v1_api: client.CoreV1Api, namespace: str) -> tuple:
+    """
+    List the warm pool pods with one call and split them into waiting and claimed pods.
+
+    Args:
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        namespace (str): The namespace of the pool.
+
+    Returns:
+        tuple: The waiting pods that can be claimed, and the claimed pods by name.
+    """
+    waiting_pods, claimed_pods = [], {}
+    for pod in core_v1_api.list_namespaced_pod(namespace=namespace, label_selector=POOL_LABEL_SELECTOR).items:
+        if pod.metadata.deletion_timestamp:
+            continue
+        pool_state = pod.metadata.labels.get("pool")
+        if pool_state == POOL_CLAIMED:
+            claimed_pods[pod.metadata.name] = pod
+        elif pool_state == POOL_WAITING and pod.status.phase == "Running":
+            waiting_pods.append(pod)
+    waiting_pods.sort(key=lambda pod: pod.metadata.name)
+    return waiting_pods, claimed_pods
+
+
+def get_pool_pod_artifact(pod: client.V1Pod) -> str:
+    """
+    Get the artifact a claimed pool pod serves.
+
+    Args:
+        pod (client.V1Pod): The claimed pool pod.
+
+    Returns:
+        str: The artifact hash, or None if the pod has not been pointed at one.
+    """
+    return (pod.metadata.annotations or {}).get(ARTIFACT_ANNOTATION)
+
+
+def can_use_pool(user_pod: UserRoutingPod) -> bool:
+    """
+    Check if a user's graph can be served by a warm pool pod.
+
+    Pool pods are started with fixed resources, so only graphs that fit them are served there.
+
+    Args:
+        user_pod (UserRoutingPod): The user's desired routing state.
+
+    Returns:
+        bool: True if a pool pod can serve the graph, otherwise False.
+    """
+    if not settings.ROUTING_POOL_ENABLED or user_pod.desired_state != UserRoutingPod.DESIRED_RUNNING:
+        return False
+    return estimate_graph_memory_mb(user_pod.node_count, user_pod.edge_count) <= settings.ROUTING_POOL_MAX_GRAPH_MB
+
+
+def claim_pool_pod(core_v1_api: client.CoreV1Api, pod: client.V1Pod, user_pod: UserRoutingPod, slot: str, namespace: str) -> bool:
+    """
+    Point a waiting pool pod at a user's artifact and hand it over to the user.
+
+    The claim file tells the pod which graph-cache to load. Relabelling the pod moves it out of
+    the pool's ReplicaSet, which starts a replacement, and into the user's Service selector.
+
+    Args:
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        pod (client.V1Pod): The waiting pool pod.
+        user_pod (UserRoutingPod): The user's desired routing state.
+        slot (str): The blue/green slot of the pod, or an empty string outside blue/green mode.
+        namespace (str): The namespace of the pool.
+
+    Returns:
+        bool: True if the pod was claimed, otherwise False.
+    """
+    pod_name = pod.metadata.name
+    claim_path = get_pool_claim_path(pod_name)
+    os.makedirs(os.path.dirname(claim_path), exist_ok=True)
+    with open(claim_path, 'w') as f:
+        f.write(f"USER_ID={user_pod.user_id}\nARTIFACT_HASH={user_pod.artifact_hash}\n")
+
+    body = {
+        "metadata": {
+            "labels": {**get_routing_labels(user_pod.user_id, slot), "pool": POOL_CLAIMED},
+            "annotations": {ARTIFACT_ANNOTATION: user_pod.artifact_hash},
+            "resourceVersion": pod.metadata.resource_version
+        }
+    }
+    try:
+        core_v1_api.patch_namespaced_pod(name=pod_name, namespace=namespace, body=body)
+    except ApiException as e:
+        print(f"Exception when claiming pool pod {pod_name}: {e}")
+        release_pool_pod(core_v1_api, pod_name, namespace)
+        return False
+
+    UserRoutingPod.objects.filter(pk=user_pod.pk).update(pool_pod_name=pod_name)
+    print(f"Pool pod {pod_name} claimed for user {user_pod.user_id}.")
+    return True
+
+
+def release_pool_pod(core_v1_api: client.CoreV1Api, pod_name: str, namespace: str):
+    """
+    Delete a claimed pool pod and its claim file.
+
+    Args:
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        pod_name (str): The name of the pool pod.
+        namespace (str): The namespace of the pool.
+    """
+    try:
+        os.remove(get_pool_claim_path(pod_name))
+    except FileNotFoundError:
+        pass
+    try:
+        core_v1_api.delete_namespaced_pod(name=pod_name, namespace=namespace, body=client.V1DeleteOptions())
+        print(f"Pool pod {pod_name} deleted.")
+    except ApiException as e:
+        if e.status != 404:
+            print(f"Exception when deleting pool pod {pod_name}: {e}")
@@ -1,98 +1,245 @@
-import os
-os.environ['USE_PYGEOS'] = '0'
+from concurrent.futures import ThreadPoolExecutor
 import geopandas as gpd
-from shapely.geometry import Polygon
-import requests
-
-from django.core.serializers import serialize
+from shapely.geometry import mapping
+from django.conf import settings
+from django.db import transaction
 from django.http import JsonResponse
-from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.geos import Polygon, MultiPolygon
 
-from ..models import Isochrone
+from ..models import Isochrone, UserRoutingPod
+from .routing_client import routing_get, RoutingUnavailable
+from .isochrone_cache import snap_origin, get_isochrone_cache_key, get_or_fetch_isochrone
+from .local_routing import local_isochrone_query
 
 
-def handle_isochrone_creation(user, isochrone_params, point_coordinates) -> JsonResponse:
+def handle_isochrone_creation(user, isochrone_params, origins) -> JsonResponse:
     """
     Handles the creation of isochrones for the user.
 
+    The polygons are stored with one bulk insert, and the response GeoJSON is built from the
+    parsed GraphHopper response instead of re-reading and serializing the stored rows.
+
     Args:
         user (User): The user for whom to create isochrones.
         isochrone_params (dict): The isochrone parameters.
-        point_coordinates (str): The coordinates of the point as a string.
+        origins (list): The coordinates of each origin as a string.
 
     Returns:
         JsonResponse: A JSON response indicating the success or failure of the operation.
     """
-    success, result = isochrone_query(
-        isochrone_params['port'],
+    query = query_isochrone_origin if len(origins) == 1 else multi_origin_isochrone_query
+    success, result = query(
+        isochrone_params,
         isochrone_params['mode_selection'],
         isochrone_params['buckets'],
         isochrone_params['time_limit'],
-        point_coordinates
+        origins[0] if len(origins) == 1 else origins
     )
 
     if success:
-        Isochrone.objects.filter(user=user).delete()
-
-        for index, row in result.iterrows():
-            geos_geom = GEOSGeometry(row['geometry'].wkt)
-            Isochrone.objects.create(user=user, geom=geos_geom)
+        with transaction.atomic():
+            Isochrone.objects.filter(user=user).delete()
+            Isochrone.objects.bulk_create([
+                Isochrone(user=user, geom=geometry_to_geos(feature['geometry']), bucket=feature['bucket'])
+                for feature in result
+            ])
 
-        iso_json = serialize('geojson', Isochrone.objects.filter(user=user), geometry_field='geom', fields=('id',))
-        return JsonResponse({'status': 'success', 'iso_json': iso_json})
+        return JsonResponse({'status': 'success', 'iso_json': isochrone_feature_collection(result)})
 
     return JsonResponse(result, status=400)
 
-def isochrone_query(service_name: str, transport_mode: str, bucket_num: int, time: int, point_coordinates: str) -> tuple:
+
+def geometry_to_geos(geometry: dict):
+    """
+    Build a GEOS geometry from a GeoJSON polygon or multipolygon without a round trip through JSON.
+
+    Args:
+        geometry (dict): The GeoJSON geometry.
+
+    Returns:
+        Polygon | MultiPolygon: The GEOS geometry in EPSG:4326.
+    """
+    if geometry['type'] == 'MultiPolygon':
+        return MultiPolygon(*(Polygon(*rings) for rings in geometry['coordinates']), srid=4326)
+    return Polygon(*geometry['coordinates'], srid=4326)
+
+
+def parse_isochrone_polygons(isochrone_json: dict) -> list:
+    """
+    Parse the polygons of a GraphHopper isochrone response in one pass.
+
+    Args:
+        isochrone_json (dict): The GraphHopper isochrone response.
+
+    Returns:
+        list: One dict per bucket with its index and GeoJSON polygon geometry, holes included.
+    """
+    return [
+        {
+            'bucket': feature.get('properties', {}).get('bucket', index),
+            'geometry': {'type': 'Polygon', 'coordinates': feature['geometry']['coordinates']}
+        }
+        for index, feature in enumerate(isochrone_json['polygons'])
+    ]
+
+
+def isochrone_feature_collection(polygons: list) -> dict:
+    """
+    Build GeoJSON for the parsed isochrone polygons.
+
+    Args:
+        polygons (list): The parsed polygons from parse_isochrone_polygons.
+
+    Returns:
+        dict: A GeoJSON FeatureCollection with the bucket of each polygon as a property.
+    """
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': polygon['geometry'], 'properties': {'bucket': polygon['bucket']}}
+            for polygon in polygons
+        ]
+    }
+
+
+def fetch_isochrone_json(base_url: str, params: dict) -> tuple:
+    """
+    Request an isochrone from a GraphHopper pod.
+
+    Args:
+        base_url (str): Base URL of the user's GraphHopper pod or service.
+        params (dict): The query parameters of the isochrone request.
+
+    Returns:
+        tuple: A boolean indicating success and the parsed response or an error dict.
+    """
+    try:
+        response = routing_get(base_url, "/isochrone", params)
+    except RoutingUnavailable as e:
+        return False, {"error": str(e)}
+
+    if response.status_code != 200:
+        try:
+            message = response.json().get('message', response.reason)
+        except ValueError:
+            message = response.reason
+        return False, {"error": f"Request failed: {message}"}
+
+    try:
+        return True, response.json()
+    except ValueError:
+        return False, {"error": "The routing engine sent an invalid response. Please try again later."}
+
+
+def isochrone_query(base_url: str, transport_mode: str, bucket_num: int, time: int, point_coordinates: str,
+                    artifact_hash: str = None) -> tuple:
     """
     Perform an isochrone query to a GraphHopper service.
 
+    The origin is snapped to a small grid and results are cached per graph artifact, so
+    repeated and concurrent identical queries only reach the routing pod once.
+
     Args:
-        service_name (str): Name of the GraphHopper service.
+        base_url (str): Base URL of the user's GraphHopper pod or service.
         transport_mode (str): Mode of transport for the isochrone query.
         bucket_num (int): Number of time buckets for the isochrone query.
         time (int): Time limit for the isochrone query in minutes.
         point_coordinates (str): Coordinates of the starting point for the isochrone query.
+        artifact_hash (str): The graph artifact answering the query, or None to skip the cache.
 
     Returns:
-        tuple: A boolean indicating success and a GeoDataFrame with the isochrone polygons.
+        tuple: A boolean indicating success and the parsed isochrone polygons.
     """
-
-    print(service_name)
     time = time * 60  # Convert minutes to seconds
-    url = f"http://{service_name}.default.svc.cluster.local:8989/isochrone"
+    point_coordinates = snap_origin(point_coordinates)
     params = {
         "profile": transport_mode,
         "buckets": bucket_num,
         "point": point_coordinates,
         "time_limit": time
     }
-    
-    attempts = 0
-    max_attempts = 100
-    
-    while attempts < max_attempts:
-        try:
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                isochrone_json = response.json()
-                polygons = []
-                for feature in isochrone_json['polygons']:
-                    coordinates = feature['geometry']['coordinates']
-                    polygon = Polygon(coordinates[0])  # Assuming one set of coordinates
-                    polygons.append({'geometry': polygon})
-                iso_gdf = gpd.GeoDataFrame(polygons, crs='EPSG:4326')
-                return True, iso_gdf
-            break  # Break the loop if the request was successful
-        except requests.ConnectionError as e:
-            if attempts == max_attempts - 1:
-                # If this was the last attempt, return an error
-                return False, {"error": "Connection failed after retrying. Please try again later."}
-        except requests.RequestException as e:
-            # Handle other types of exceptions without retrying
-            return False, {"error": f"Request failed: {e}"}
-        attempts += 1  # Increment the attempt counter
-
-    # Return False and an empty GeoDataFrame in case of failure not caught by exceptions
-    empty_gdf = gpd.GeoDataFrame(columns=['geometry'], crs='EPSG:4326')
-    return False, empty_gdf
\ No newline at end of file
+
+    cache_key = get_isochrone_cache_key(artifact_hash, transport_mode, bucket_num, time, point_coordinates) if artifact_hash else None
+    success, isochrone_json = get_or_fetch_isochrone(cache_key, lambda: fetch_isochrone_json(base_url, params))
+    if not success:
+        return False, isochrone_json
+
+    return True, parse_isochrone_polygons(isochrone_json)
+
+
+def union_isochrone_polygons(polygon_sets: list) -> list:
+    """
+    Merge the isochrones of several origins into one polygon per bucket.
+
+    All polygons go into a single GeoDataFrame and are dissolved by bucket in one pass, so an
+    area counts as reachable in a bucket if it is reachable from any origin.
+
+    Args:
+        polygon_sets (list): The parsed polygons of each origin.
+
+    Returns:
+        list: One dict per bucket with its index and GeoJSON polygon or multipolygon geometry.
+    """
+    features = [
+        {'type': 'Feature', 'geometry': polygon['geometry'], 'properties': {'bucket': polygon['bucket']}}
+        for polygons in polygon_sets for polygon in polygons
+    ]
+    merged = gpd.GeoDataFrame.from_features(features, crs='EPSG:4326').dissolve(by='bucket', sort=True)
+    return [
+        {'bucket': int(bucket), 'geometry': mapping(geometry if geometry.is_valid else geometry.buffer(0))}
+        for bucket, geometry in zip(merged.index, merged.geometry)
+    ]
+
+
+def query_isochrone_origin(isochrone_params: dict, transport_mode: str, bucket_num: int, time: int,
+                           point_coordinates: str) -> tuple:
+    """
+    Perform an isochrone query for one origin with the user's routing engine.
+
+    Args:
+        isochrone_params (dict): The user's routing target from get_user_isochrone_preferences.
+        transport_mode (str): Mode of transport for the isochrone query.
+        bucket_num (int): Number of time buckets for the isochrone query.
+        time (int): Time limit for the isochrone query in minutes.
+        point_coordinates (str): Coordinates of the starting point for the isochrone query.
+
+    Returns:
+        tuple: A boolean indicating success and the parsed isochrone polygons or an error dict.
+    """
+    if isochrone_params.get('engine') == UserRoutingPod.ENGINE_LOCAL:
+        return local_isochrone_query(isochrone_params['graph_path'], transport_mode, bucket_num, time, point_coordinates)
+    return isochrone_query(
+        isochrone_params['base_url'], transport_mode, bucket_num, time, point_coordinates,
+        artifact_hash=isochrone_params.get('artifact_hash')
+    )
+
+
+def multi_origin_isochrone_query(isochrone_params: dict, transport_mode: str, bucket_num: int, time: int,
+                                 origins: list) -> tuple:
+    """
+    Perform isochrone queries for several origins in parallel and merge them per bucket.
+
+    Each origin is queried and cached like a single isochrone, so adding a marker only
+    queries the routing pod for the new origin.
+
+    Args:
+        isochrone_params (dict): The user's routing target from get_user_isochrone_preferences.
+        transport_mode (str): Mode of transport for the isochrone query.
+        bucket_num (int): Number of time buckets for the isochrone query.
+        time (int): Time limit for the isochrone query in minutes.
+        origins (list): Coordinates of the starting points for the isochrone query.
+
+    Returns:
+        tuple: A boolean indicating success and the merged isochrone polygons, or the first error.
+    """
+    def query_origin(point_coordinates: str) -> tuple:
+        return query_isochrone_origin(isochrone_params, transport_mode, bucket_num, time, point_coordinates)
+
+    with ThreadPoolExecutor(max_workers=min(settings.ISOCHRONE_BATCH_CONCURRENCY, len(origins))) as executor:
+        results = list(executor.map(query_origin, origins))
+
+    for success, result in results:
+        if not success:
+            return False, result
+
+    return True, union_isochrone_polygons([result for _, result in results])
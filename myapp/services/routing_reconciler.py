@@ -0,0 +1,418 @@
+import hashlib
+import json
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from ..models import UserRoutingPod
+from .create_routing_pod import (
+    load_kube_config,
+    get_k8s_apis,
+    create_graph_builder_job_object,
+    start_graph_builder_job,
+    get_routing_labels,
+    get_deployment_name,
+    create_deployment_object,
+    create_service_object
+)
+from .graph_artifacts import graph_cache_exists
+from .routing_pod_status import get_pod_routing_status, get_pod_warmup_ms
+from .routing_pool import (
+    list_pool_pods,
+    get_pool_pod_artifact,
+    can_use_pool,
+    claim_pool_pod,
+    release_pool_pod
+)
+
+FIELD_MANAGER = "isochrone-reconciler"
+SPEC_HASH_ANNOTATION = "isochrone/spec-hash"
+ROUTING_OBJECT_SELECTOR = "app=graphhopper,user"
+
+
+def get_object_spec_hash(api_client: client.ApiClient, obj) -> str:
+    """
+    Hash the serialized form of a desired Kubernetes object.
+
+    Args:
+        api_client (client.ApiClient): The API client used to serialize the object.
+        obj: The Kubernetes object to hash.
+
+    Returns:
+        str: A short hex digest of the object.
+    """
+    serialized = json.dumps(api_client.sanitize_for_serialization(obj), sort_keys=True)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()[:16]
+
+
+def with_spec_hash(api_client: client.ApiClient, obj):
+    """
+    Annotate a desired Kubernetes object with the hash of its own spec.
+
+    Args:
+        api_client (client.ApiClient): The API client used to serialize the object.
+        obj: The Kubernetes object to annotate.
+
+    Returns:
+        The annotated object.
+    """
+    spec_hash = get_object_spec_hash(api_client, obj)
+    obj.metadata.annotations = {**(obj.metadata.annotations or {}), SPEC_HASH_ANNOTATION: spec_hash}
+    return obj
+
+
+def needs_apply(desired, actual) -> bool:
+    """
+    Check if the desired object differs from what is running in the cluster.
+
+    Args:
+        desired: The annotated desired object.
+        actual: The object read from the cluster, or None if it does not exist.
+
+    Returns:
+        bool: True if the object has to be applied, otherwise False.
+    """
+    if actual is None:
+        return True
+    actual_hash = (actual.metadata.annotations or {}).get(SPEC_HASH_ANNOTATION)
+    return actual_hash != desired.metadata.annotations[SPEC_HASH_ANNOTATION]
+
+
+def server_side_apply(api_client: client.ApiClient, patch_fn, obj, namespace: str):
+    """
+    Create or update a Kubernetes object with server-side apply.
+
+    Args:
+        api_client (client.ApiClient): The API client used to serialize the object.
+        patch_fn: The namespaced patch method of the object's kind.
+        obj: The object to apply.
+        namespace (str): The namespace of the object.
+    """
+    patch_fn(
+        name=obj.metadata.name,
+        namespace=namespace,
+        body=api_client.sanitize_for_serialization(obj),
+        field_manager=FIELD_MANAGER,
+        force=True,
+        _content_type="application/apply-patch+yaml"
+    )
+
+
+def ensure_artifact_built(batch_v1_api: client.BatchV1Api, user_pod: UserRoutingPod, image: str, namespace: str) -> bool:
+    """
+    Make sure the graph-cache a user wants to serve exists, starting its builder job if needed.
+
+    Args:
+        batch_v1_api (client.BatchV1Api): The BatchV1Api client.
+        user_pod (UserRoutingPod): The user's desired routing state.
+        image (str): The GraphHopper Docker image.
+        namespace (str): The namespace in which to run the job.
+
+    Returns:
+        bool: True if the graph-cache is ready to be served, otherwise False.
+    """
+    if graph_cache_exists(user_pod.artifact_hash):
+        return True
+
+    job = create_graph_builder_job_object(user_pod.user_id, image, user_pod.artifact_hash, user_pod.node_count, user_pod.edge_count)
+    job_state = start_graph_builder_job(batch_v1_api, job, namespace)
+
+    if job_state == "succeeded":
+        return graph_cache_exists(user_pod.artifact_hash)
+    if job_state == "failed":
+        user_pods = UserRoutingPod.objects.filter(pk=user_pod.pk, artifact_hash=user_pod.artifact_hash)
+        if settings.ROUTING_BLUE_GREEN and user_pod.active_artifact_hash and user_pod.routing_status == UserRoutingPod.STATUS_READY:
+            # Keep serving the previous graph instead of tearing it down
+            user_pods.update(artifact_hash=user_pod.active_artifact_hash)
+            print(f"Graph build for user {user_pod.user_id} failed, keeping the previous graph.")
+        else:
+            user_pods.update(
+                desired_state=UserRoutingPod.DESIRED_ABSENT,
+                routing_status=UserRoutingPod.STATUS_FAILED,
+                button_activate=False
+            )
+    return False
+
+
+def get_target_slot(user_pod: UserRoutingPod) -> str:
+    """
+    Pick the slot a user's current graph should run in.
+
+    Outside blue/green mode there is a single unslotted deployment. In blue/green mode an
+    unchanged graph stays in the active slot, and a new graph goes to the other one.
+
+    Args:
+        user_pod (UserRoutingPod): The user's desired routing state.
+
+    Returns:
+        str: The slot name, or an empty string outside blue/green mode.
+    """
+    if not settings.ROUTING_BLUE_GREEN:
+        return ''
+    if user_pod.active_slot and user_pod.active_artifact_hash == user_pod.artifact_hash:
+        return user_pod.active_slot
+    if user_pod.active_slot == UserRoutingPod.SLOT_BLUE:
+        return UserRoutingPod.SLOT_GREEN
+    return UserRoutingPod.SLOT_BLUE
+
+
+def is_deployment_ready(desired: client.V1Deployment, actual: client.V1Deployment) -> bool:
+    """
+    Check if a listed deployment runs the desired spec with all of its replicas available.
+
+    Available replicas have passed their readiness probe, so GraphHopper has loaded the graph.
+
+    Args:
+        desired (client.V1Deployment): The annotated desired deployment.
+        actual (client.V1Deployment): The deployment read from the cluster, or None if it does not exist.
+
+    Returns:
+        bool: True if the deployment can take traffic, otherwise False.
+    """
+    if actual is None or needs_apply(desired, actual):
+        return False
+    replicas = actual.spec.replicas
+    status = actual.status
+    return (
+        (status.observed_generation or 0) >= (actual.metadata.generation or 0) and
+        status.replicas == replicas and
+        status.updated_replicas == replicas and
+        status.available_replicas == replicas
+    )
+
+
+def find_ready_pod(core_v1_api: client.CoreV1Api, user_id: int, slot: str, namespace: str) -> client.V1Pod:
+    """
+    Find a ready GraphHopper pod of a user's slot.
+
+    Args:
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        user_id (int): The user ID the pod belongs to.
+        slot (str): The slot of the pod.
+        namespace (str): The namespace of the pod.
+
+    Returns:
+        client.V1Pod: The ready pod, or None if there is none.
+    """
+    label_selector = ",".join(f"{key}={value}" for key, value in get_routing_labels(user_id, slot).items())
+    for pod in core_v1_api.list_namespaced_pod(namespace=namespace, label_selector=label_selector).items:
+        if get_pod_routing_status(pod) == UserRoutingPod.STATUS_READY:
+            return pod
+    return None
+
+
+def switch_active_slot(user_pod: UserRoutingPod, slot: str, swapped: bool, ready_pod: client.V1Pod = None):
+    """
+    Record which slot and graph a user's service now routes to.
+
+    Args:
+        user_pod (UserRoutingPod): The user's desired routing state.
+        slot (str): The slot the service now selects.
+        swapped (bool): True if traffic moved from a serving deployment to a ready one.
+        ready_pod (client.V1Pod): The ready pod traffic moved to, if known.
+    """
+    fields = {'active_slot': slot, 'active_artifact_hash': user_pod.artifact_hash}
+    if swapped:
+        # The watcher ignored the new pod while it was on standby
+        fields.update(routing_status=UserRoutingPod.STATUS_READY, button_activate=True)
+        if ready_pod is not None:
+            fields.update(pod_name=ready_pod.metadata.name, pod_ip=ready_pod.status.pod_ip, warmup_ms=get_pod_warmup_ms(ready_pod))
+    UserRoutingPod.objects.filter(pk=user_pod.pk, artifact_hash=user_pod.artifact_hash).update(**fields)
+
+
+def apply_routing_service(api_client: client.ApiClient, core_v1_api: client.CoreV1Api, user_id: int, slot: str,
+                          actual_service: client.V1Service, namespace: str) -> bool:
+    """
+    Apply a user's Service if it differs from the one in the cluster.
+
+    Args:
+        api_client (client.ApiClient): The API client used to serialize the object.
+        core_v1_api (client.CoreV1Api): The CoreV1Api client.
+        user_id (int): The user ID the Service belongs to.
+        slot (str): The blue/green slot the Service routes to, or an empty string outside blue/green mode.
+        actual_service (client.V1Service): The Service read from the cluster, or None if it does not exist.
+        namespace (str): The namespace of the Service.
+
+    Returns:
+        bool: True if the Service was applied, otherwise False.
+    """
+    if settings.ROUTING_SHARED_SERVICE:
+        # Users share the headless Service from the Helm chart
+        return False
+    service = with_spec_hash(api_client, create_service_object(user_id, container_port=8989, slot=slot))
+    if not needs_apply(service, actual_service):
+        return False
+    server_side_apply(api_client, core_v1_api.patch_namespaced_service, service, namespace)
+    print(f"Service {service.metadata.name} applied.")
+    return True
+
+
+def mark_idle_routing_pods(idle_seconds: int) -> int:
+    """
+    Mark routing pods without isochrone traffic for a while as idle.
+
+    Idle deployments are scaled to zero replicas but keep their artifact, so the graph-cache
+    is loaded again instead of rebuilt when the user comes back.
+
+    Args:
+        idle_seconds (int): How long a pod may go unused before it is scaled down, 0 disables it.
+
+    Returns:
+        int: The number of pods marked as idle.
+    """
+    if not idle_seconds:
+        return 0
+    cutoff = timezone.now() - timedelta(seconds=idle_seconds)
+    return UserRoutingPod.objects.filter(
+        desired_state=UserRoutingPod.DESIRED_RUNNING, last_used_at__lt=cutoff
+    ).update(desired_state=UserRoutingPod.DESIRED_IDLE)
+
+
+def reconcile_routing_pods(namespace: str = "default") -> dict:
+    """
+    Bring the GraphHopper deployments and services in the cluster in line with the database.
+
+    Desired state comes from UserRoutingPod. Actual state is read with one list call per kind,
+    and only objects whose spec hash differs are applied, with server-side apply. Objects for
+    users that no longer want a routing pod are deleted, and idle users keep their deployment
+    scaled to zero. A new graph that fits the warm pool is served by a claimed pool pod
+    instead of a fresh deployment.
+
+    In blue/green mode a rebuilt graph comes up in the standby slot while the active deployment
+    keeps serving. The service switches over once the standby deployment is ready, and only
+    then is the old deployment deleted.
+
+    Args:
+        namespace (str): The namespace of the routing objects.
+
+    Returns:
+        dict: Counts of the objects applied and deleted, of artifacts still building, of
+              graphs waiting to take over traffic, of pool pods claimed and of pods marked idle.
+    """
+    load_kube_config()
+    apps_v1_api, core_v1_api = get_k8s_apis()
+    batch_v1_api = client.BatchV1Api()
+    api_client = client.ApiClient()
+    image = os.getenv("IMAGE")
+
+    actual_deployments = {
+        d.metadata.name: d for d in apps_v1_api.list_namespaced_deployment(namespace=namespace, label_selector=ROUTING_OBJECT_SELECTOR).items
+    }
+    actual_services = {
+        s.metadata.name: s for s in core_v1_api.list_namespaced_service(namespace=namespace, label_selector=ROUTING_OBJECT_SELECTOR).items
+    }
+
+    waiting_pool_pods, claimed_pool_pods = list_pool_pods(core_v1_api, namespace)
+
+    stats = {'applied': 0, 'deleted': 0, 'building': 0, 'swapping': 0, 'claimed': 0}
+    stats['idled'] = mark_idle_routing_pods(settings.ROUTING_IDLE_SECONDS)
+    desired_names = set()
+    desired_pool_pods = set()
+
+    desired_pods = UserRoutingPod.objects.filter(
+        desired_state__in=[UserRoutingPod.DESIRED_RUNNING, UserRoutingPod.DESIRED_IDLE], artifact_hash__isnull=False
+    )
+    for user_pod in desired_pods:
+        slot = get_target_slot(user_pod)
+        deployment_name = get_deployment_name(user_pod.user_id, slot)
+        active_name = get_deployment_name(user_pod.user_id, user_pod.active_slot)
+        service_name = f"graphhopper-{user_pod.user_id}-service"
+        running = user_pod.desired_state == UserRoutingPod.DESIRED_RUNNING
+        pool_pod = claimed_pool_pods.get(user_pod.pool_pod_name) if user_pod.pool_pod_name else None
+        pool_artifact = get_pool_pod_artifact(pool_pod) if pool_pod is not None and running else None
+
+        if pool_artifact and pool_artifact == user_pod.artifact_hash:
+            # A claimed pool pod already serves the current graph, so no deployment is needed
+            desired_pool_pods.add(pool_pod.metadata.name)
+            if not settings.ROUTING_SHARED_SERVICE:
+                desired_names.add(service_name)
+            pool_slot = pool_pod.metadata.labels.get("slot", "")
+            try:
+                if apply_routing_service(api_client, core_v1_api, user_pod.user_id, pool_slot, actual_services.get(service_name), namespace):
+                    stats['applied'] += 1
+            except ApiException as e:
+                print(f"Exception when applying routing objects for user {user_pod.user_id}: {e}")
+            continue
+
+        # The active deployment or pool pod is left untouched while the new graph comes up beside it
+        pool_serving = bool(settings.ROUTING_BLUE_GREEN and pool_artifact and pool_artifact == user_pod.active_artifact_hash)
+        if pool_serving:
+            desired_pool_pods.add(pool_pod.metadata.name)
+        serving = active_name != deployment_name and (active_name in actual_deployments or pool_serving)
+        desired_names.add(deployment_name)
+        if not settings.ROUTING_SHARED_SERVICE:
+            desired_names.add(service_name)
+        if serving and active_name in actual_deployments:
+            desired_names.add(active_name)
+
+        if not ensure_artifact_built(batch_v1_api, user_pod, image, namespace):
+            stats['building'] += 1
+            continue
+
+        try:
+            if not serving and deployment_name not in actual_deployments and waiting_pool_pods and can_use_pool(user_pod):
+                candidate = waiting_pool_pods.pop(0)
+                if claim_pool_pod(core_v1_api, candidate, user_pod, slot, namespace):
+                    stats['claimed'] += 1
+                    desired_pool_pods.add(candidate.metadata.name)
+                    if apply_routing_service(api_client, core_v1_api, user_pod.user_id, slot, actual_services.get(service_name), namespace):
+                        stats['applied'] += 1
+                    switch_active_slot(user_pod, slot, False)
+                    continue
+
+            deployment = with_spec_hash(api_client, create_deployment_object(
+                user_pod.user_id, image, user_pod.artifact_hash, user_pod.node_count, user_pod.edge_count, slot=slot,
+                replicas=0 if user_pod.desired_state == UserRoutingPod.DESIRED_IDLE else 1
+            ))
+            if needs_apply(deployment, actual_deployments.get(deployment_name)):
+                server_side_apply(api_client, apps_v1_api.patch_namespaced_deployment, deployment, namespace)
+                stats['applied'] += 1
+                print(f"Deployment {deployment_name} applied.")
+            if serving and not is_deployment_ready(deployment, actual_deployments.get(deployment_name)):
+                stats['swapping'] += 1
+                continue
+            # Available pods may still be running their warm-up queries
+            ready_pod = find_ready_pod(core_v1_api, user_pod.user_id, slot, namespace) if serving else None
+            if serving and ready_pod is None:
+                stats['swapping'] += 1
+                continue
+            if apply_routing_service(api_client, core_v1_api, user_pod.user_id, slot, actual_services.get(service_name), namespace):
+                stats['applied'] += 1
+            if (user_pod.active_slot, user_pod.active_artifact_hash) != (slot, user_pod.artifact_hash):
+                switch_active_slot(user_pod, slot, serving, ready_pod)
+                if serving:
+                    desired_names.discard(active_name)
+                    desired_pool_pods.discard(user_pod.pool_pod_name)
+                    print(f"Traffic for user {user_pod.user_id} switched to {deployment_name}.")
+        except ApiException as e:
+            print(f"Exception when applying routing objects for user {user_pod.user_id}: {e}")
+
+    for name in set(actual_deployments) - desired_names:
+        try:
+            apps_v1_api.delete_namespaced_deployment(name=name, namespace=namespace, body=client.V1DeleteOptions())
+            stats['deleted'] += 1
+            print(f"Deployment {name} deleted.")
+        except ApiException as e:
+            if e.status != 404:
+                print(f"Exception when deleting deployment {name}: {e}")
+
+    for name in set(actual_services) - desired_names:
+        try:
+            core_v1_api.delete_namespaced_service(name=name, namespace=namespace, body=client.V1DeleteOptions())
+            stats['deleted'] += 1
+            print(f"Service {name} deleted.")
+        except ApiException as e:
+            if e.status != 404:
+                print(f"Exception when deleting service {name}: {e}")
+
+    for name in set(claimed_pool_pods) - desired_pool_pods:
+        release_pool_pod(core_v1_api, name, namespace)
+        stats['deleted'] += 1
+    UserRoutingPod.objects.filter(pool_pod_name__isnull=False).exclude(
+        pool_pod_name__in=desired_pool_pods
+    ).update(pool_pod_name=None)
+
+    return stats
@@ -0,0 +1,130 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from .create_routing_pod import load_kube_config, get_k8s_apis
+from .routing_pool import get_pool_claim_path
+
+# Users per label selector, which keeps each delete_collection request a reasonable size
+TEARDOWN_CHUNK_SIZE = 100
+TEARDOWN_MAX_WORKERS = 8
+
+
+def get_users_selector(user_ids: list, base_selector: str) -> str:
+    """
+    Build a label selector matching the routing objects of several users.
+
+    Args:
+        user_ids (list): The IDs of the users.
+        base_selector (str): The selector every object has to match as well.
+
+    Returns:
+        str: The combined label selector.
+    """
+    return f"{base_selector},user in ({','.join(str(user_id) for user_id in user_ids)})"
+
+
+def delete_by_name(delete_fn, names: list, namespace: str) -> list:
+    """
+    Delete objects one by one from a bounded thread pool.
+
+    Args:
+        delete_fn: The namespaced delete method of the objects' kind.
+        names (list): The names of the objects to delete.
+        namespace (str): The namespace of the objects.
+
+    Returns:
+        list: The names of the objects this call deleted.
+    """
+    def delete_one(name: str) -> bool:
+        try:
+            delete_fn(name=name, namespace=namespace, body=client.V1DeleteOptions())
+            return True
+        except ApiException as e:
+            if e.status != 404:
+                print(f"Error deleting {name}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=TEARDOWN_MAX_WORKERS) as executor:
+        return [name for name, deleted in zip(names, executor.map(delete_one, names)) if deleted]
+
+
+def delete_collection(list_fn, delete_collection_fn, delete_fn, label_selector: str, namespace: str) -> list:
+    """
+    Delete every object matching a label selector with one request.
+
+    Falls back to deleting the listed objects one by one if the collection delete is refused.
+
+    Args:
+        list_fn: The namespaced list method of the objects' kind.
+        delete_collection_fn: The namespaced delete_collection method of the objects' kind.
+        delete_fn: The namespaced delete method of the objects' kind.
+        label_selector (str): The label selector of the objects to delete.
+        namespace (str): The namespace of the objects.
+
+    Returns:
+        list: The names of the objects that were deleted.
+    """
+    names = [item.metadata.name for item in list_fn(namespace=namespace, label_selector=label_selector).items]
+    if not names:
+        return names
+    try:
+        delete_collection_fn(namespace=namespace, label_selector=label_selector)
+    except ApiException as e:
+        print(f"Collection delete for '{label_selector}' failed ({e.status}), deleting one by one.")
+        return delete_by_name(delete_fn, names, namespace)
+
+    # The collection delete may stop part-way, so only objects that are gone or terminating count
+    remaining = {
+        item.metadata.name for item in list_fn(namespace=namespace, label_selector=label_selector).items
+        if item.metadata.deletion_timestamp is None
+    }
+    return [name for name in names if name not in remaining]
+
+
+def teardown_routing_objects(user_ids: list, namespace: str = "default") -> dict:
+    """
+    Delete the routing deployments, services and claimed pool pods of many users at once.
+
+    Args:
+        user_ids (list): The IDs of the users to tear down.
+        namespace (str): The namespace of the routing objects.
+
+    Returns:
+        dict: The number of users, of each kind of object deleted and the run time in seconds.
+    """
+    started = time.monotonic()
+    stats = {'users': len(user_ids), 'deployments': 0, 'services': 0, 'pool_pods': 0}
+    if not user_ids:
+        stats['seconds'] = 0.0
+        return stats
+
+    load_kube_config()
+    apps_v1_api, core_v1_api = get_k8s_apis()
+
+    for start in range(0, len(user_ids), TEARDOWN_CHUNK_SIZE):
+        chunk = user_ids[start:start + TEARDOWN_CHUNK_SIZE]
+
+        stats['deployments'] += len(delete_collection(
+            apps_v1_api.list_namespaced_deployment, apps_v1_api.delete_collection_namespaced_deployment,
+            apps_v1_api.delete_namespaced_deployment, get_users_selector(chunk, "app=graphhopper"), namespace
+        ))
+        stats['services'] += len(delete_collection(
+            core_v1_api.list_namespaced_service, core_v1_api.delete_collection_namespaced_service,
+            core_v1_api.delete_namespaced_service, get_users_selector(chunk, "app=graphhopper"), namespace
+        ))
+        pool_pods = delete_collection(
+            core_v1_api.list_namespaced_pod, core_v1_api.delete_collection_namespaced_pod,
+            core_v1_api.delete_namespaced_pod, get_users_selector(chunk, "app=graphhopper,pool=claimed"), namespace
+        )
+        for pod_name in pool_pods:
+            try:
+                os.remove(get_pool_claim_path(pod_name))
+            except FileNotFoundError:
+                pass
+        stats['pool_pods'] += len(pool_pods)
+
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    return stats
@@ -0,0 +1,160 @@
+import json
+import os
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from scipy.sparse.csgraph import dijkstra
+
+from ..models import TravelTimeMatrix
+from .graph_artifacts import get_user_files_dir
+from .local_routing import MODES, get_local_graph_path, get_mode_csgraph, load_local_graph, snap_to_nodes
+
+MATRIX_FOLDER = 'matrices'
+
+# Caps the memory of the shortest-path trees of one tile, at 8 bytes per reached node
+MATRIX_TILE_CELL_BUDGET = 16_000_000
+
+
+def parse_coordinate_list(payload: dict, key: str) -> np.ndarray:
+    """
+    Read a list of [latitude, longitude] pairs from a request payload.
+
+    Args:
+        payload (dict): The parsed request body.
+        key (str): The key of the list.
+
+    Returns:
+        np.ndarray: The points as (latitude, longitude) rows.
+
+    Raises:
+        ValidationError: If the list is missing, empty or malformed.
+    """
+    try:
+        points = np.array(payload[key], dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError(f'Send "{key}" as a list of [latitude, longitude] pairs.')
+    if points.ndim != 2 or points.shape[1] != 2 or not len(points):
+        raise ValidationError(f'Send "{key}" as a list of [latitude, longitude] pairs.')
+    return points
+
+
+def parse_matrix_request(body: bytes, default_mode: str) -> tuple:
+    """
+    Parse and validate the origins, destinations and mode of a travel-time matrix request.
+
+    Args:
+        body (bytes): The request body, JSON with "origins", "destinations" and an optional "mode".
+        default_mode (str): The mode used if the request does not name one.
+
+    Returns:
+        tuple: The origins and destinations as (latitude, longitude) rows, and the mode.
+
+    Raises:
+        ValidationError: If the request is malformed or too large.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise ValidationError('Send a JSON body with "origins" and "destinations".')
+    if not isinstance(payload, dict):
+        raise ValidationError('Send a JSON body with "origins" and "destinations".')
+
+    origins = parse_coordinate_list(payload, 'origins')
+    destinations = parse_coordinate_list(payload, 'destinations')
+    mode = payload.get('mode') or default_mode
+    if mode not in MODES:
+        raise ValidationError(f"Unknown transport mode: {mode}")
+    if len(origins) * len(destinations) > settings.MATRIX_MAX_CELLS:
+        raise ValidationError(f"A matrix can hold at most {settings.MATRIX_MAX_CELLS} origin and destination pairs.")
+    return origins, destinations, mode
+
+
+def get_tile_rows(node_count: int) -> int:
+    """
+    Get the number of origins computed together, bounded by the memory of their shortest-path trees.
+
+    Args:
+        node_count (int): The number of nodes in the graph.
+
+    Returns:
+        int: The number of matrix rows per tile.
+    """
+    return max(1, min(settings.MATRIX_TILE_ROWS, MATRIX_TILE_CELL_BUDGET // max(node_count, 1)))
+
+
+def iter_matrix_tiles(graph: dict, mode: str, origins: np.ndarray, destinations: np.ndarray):
+    """
+    Compute a travel-time matrix in tiles of origins.
+
+    Each tile runs one multi-source Dijkstra call that builds a shortest-path tree per distinct
+    origin node, and reads the travel times to every destination from it.
+
+    Args:
+        graph (dict): The loaded graph from load_local_graph.
+        mode (str): The transport mode.
+        origins (np.ndarray): The origins as (latitude, longitude) rows.
+        destinations (np.ndarray): The destinations as (latitude, longitude) rows.
+
+    Yields:
+        bytes: Consecutive row-major little-endian float32 tiles of travel times in seconds.
+        Pairs that are not connected are inf, and rows or columns of points off the network are NaN.
+    """
+    csgraph = get_mode_csgraph(graph, mode)
+    origin_nodes = snap_to_nodes(graph, origins[:, 0], origins[:, 1])
+    destination_nodes = snap_to_nodes(graph, destinations[:, 0], destinations[:, 1])
+    destinations_snapped = destination_nodes >= 0
+    tile_rows = get_tile_rows(graph['meta']['node_count'])
+
+    for start in range(0, len(origin_nodes), tile_rows):
+        tile_nodes = origin_nodes[start:start + tile_rows]
+        tile = np.full((len(tile_nodes), len(destination_nodes)), np.nan, dtype='<f4')
+
+        snapped = tile_nodes >= 0
+        if snapped.any():
+            # Origins snapped to the same node share one shortest-path tree
+            sources, tree_rows = np.unique(tile_nodes[snapped], return_inverse=True)
+            travel_times = dijkstra(csgraph, directed=True, indices=sources)
+            tile[np.ix_(snapped, destinations_snapped)] = travel_times[tree_rows][:, destination_nodes[destinations_snapped]]
+
+        yield tile.tobytes()
+
+
+def get_matrix_path(matrix_id: int) -> str:
+    """
+    Returns the path of the travel times of a travel-time matrix job.
+
+    Args:
+        matrix_id (int): The ID of the travel-time matrix.
+
+    Returns:
+        str: The path of the raw float32 file on the shared volume.
+    """
+    return os.path.join(get_user_files_dir(), MATRIX_FOLDER, f"{matrix_id}.f32")
+
+
+def compute_travel_time_matrix(matrix: TravelTimeMatrix):
+    """
+    Compute the travel-time matrix of a large network in the background.
+
+    The tiles are written in the same format as the streamed response, row-major little-endian
+    float32 seconds, to a temporary file that is moved into place once complete.
+
+    Args:
+        matrix (TravelTimeMatrix): The pending matrix to compute.
+    """
+    TravelTimeMatrix.objects.filter(pk=matrix.pk).update(status=TravelTimeMatrix.STATUS_RUNNING)
+    graph = load_local_graph(get_local_graph_path(matrix.user_id))
+    origins = np.array(matrix.origins, dtype=np.float64)
+    destinations = np.array(matrix.destinations, dtype=np.float64)
+
+    matrix_path = get_matrix_path(matrix.pk)
+    os.makedirs(os.path.dirname(matrix_path), exist_ok=True)
+    temp_path = f"{matrix_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        for tile in iter_matrix_tiles(graph, matrix.mode_selection, origins, destinations):
+            f.write(tile)
+    os.replace(temp_path, matrix_path)
+
+    TravelTimeMatrix.objects.filter(pk=matrix.pk).update(status=TravelTimeMatrix.STATUS_DONE, finished_at=timezone.now())
+    print(f"Travel-time matrix {matrix.pk}: {len(origins)}x{len(destinations)} written to {matrix_path}.")
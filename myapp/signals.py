@@ -1,13 +1,17 @@
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
+from django.utils import timezone
 from myapp.models import UserSessionStatus
+from myapp.tasks import resume_routing_on_login
 
 @receiver(user_logged_in)
 def handle_user_login(sender, request, user, **kwargs):
     UserSessionStatus.objects.update_or_create(
         user=user,
-        defaults={'is_logged_in': True}
+        defaults={'is_logged_in': True, 'session_expired': False, 'last_seen': timezone.now()}
     )
+    # Bring the last built routing pod back up in the background while the user loads the map
+    resume_routing_on_login.delay(user.id)
 
 @receiver(user_logged_out)
 def handle_user_logout(sender, request, user, **kwargs):
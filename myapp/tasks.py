@@ -1,5 +1,20 @@
+import time
+import redis
 from celery import shared_task
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.management import call_command
+from django.utils import timezone
+
+from .models import AccessibilityGrid, TravelTimeMatrix
+from .services.accessibility_grid import compute_accessibility_grid
+from .services.create_routing_pod import resume_user_routing
+from .services.isochrone_precompute import precompute_user_isochrone
+from .services.travel_time_matrix import compute_travel_time_matrix
+from .services.prepare_docker_data import get_box_gdf
+from .utils.osm_conversion import prefetch_base_network
+from .services.routing_reconciler import reconcile_routing_pods
 
 @shared_task
 def close_expired_sessions():
@@ -8,3 +23,74 @@ def close_expired_sessions():
 @shared_task
 def check_expired_sessions():
     call_command('check_expired_sessions')
+
+@shared_task
+def reconcile_routing():
+    # Only one reconciliation cycle may run at a time across all workers
+    lock = redis.Redis.from_url(settings.CELERY_BROKER_URL).lock(
+        'reconcile-routing-pods', timeout=settings.ROUTING_RECONCILE_LOCK_SECONDS, blocking_timeout=0
+    )
+    if not lock.acquire():
+        return
+    started = time.monotonic()
+    try:
+        stats = reconcile_routing_pods()
+        if any(stats.values()):
+            print(f"Routing reconciliation: {stats}")
+    finally:
+        seconds = time.monotonic() - started
+        if seconds > settings.ROUTING_RECONCILE_LOCK_SECONDS:
+            print(f"Routing reconciliation took {seconds:.1f}s, longer than its {settings.ROUTING_RECONCILE_LOCK_SECONDS}s lock.")
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            pass  # The lock expired during the cycle, and another worker may hold it now
+
+@shared_task
+def resume_routing_on_login(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user:
+        resume_user_routing(user)
+
+@shared_task
+def compute_accessibility(grid_id):
+    grid = AccessibilityGrid.objects.filter(pk=grid_id, status=AccessibilityGrid.STATUS_PENDING).first()
+    if not grid:
+        return
+    try:
+        compute_accessibility_grid(grid)
+    except Exception as e:
+        print(f"Accessibility grid {grid_id} failed: {e}")
+        error = ' '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+        AccessibilityGrid.objects.filter(pk=grid_id).update(
+            status=AccessibilityGrid.STATUS_FAILED, error=error, finished_at=timezone.now()
+        )
+
+@shared_task
+def compute_matrix(matrix_id):
+    matrix = TravelTimeMatrix.objects.filter(pk=matrix_id, status=TravelTimeMatrix.STATUS_PENDING).first()
+    if not matrix:
+        return
+    try:
+        compute_travel_time_matrix(matrix)
+    except Exception as e:
+        print(f"Travel-time matrix {matrix_id} failed: {e}")
+        error = ' '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+        TravelTimeMatrix.objects.filter(pk=matrix_id).update(
+            status=TravelTimeMatrix.STATUS_FAILED, error=error, finished_at=timezone.now()
+        )
+
+@shared_task
+def precompute_isochrone(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user:
+        precompute_user_isochrone(user)
+
+@shared_task
+def prefetch_box_network(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    bbox_gdf = get_box_gdf(user) if user else None
+    if bbox_gdf is None:
+        return
+    node_count, edge_count = prefetch_base_network(bbox_gdf)
+    print(f"Prefetched base network for user {user_id}: {node_count} nodes / {edge_count} edges.")
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import shutil
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+GRAPH_ARRAYS_VERSION = 1
+GRAPH_ARRAYS_SUFFIX = '.graph'
+META_FILE = 'meta.json'
+# Edge arrays are stored in CSR order, so the edges leaving node i are edges indptr[i]:indptr[i + 1]
+NODE_ARRAYS = ('node_x', 'node_y', 'node_ids', 'indptr')
+EDGE_ARRAYS = ('indices', 'edge_length', 'edge_highway', 'edge_maxspeed', 'edge_oneway')
+
+MAXSPEED_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(mph)?')
+MPH_TO_KMH = 1.609344
+
+
+def get_graph_arrays_path(osm_file_path: str) -> str:
+    """
+    Get the folder of the graph arrays written next to an OSM file.
+
+    Args:
+        osm_file_path (str): Path to the OSM XML file, e.g. '.../{user_id}.osm'.
+
+    Returns:
+        str: Path to the graph arrays folder, e.g. '.../{user_id}.graph'.
+    """
+    return f"{os.path.splitext(osm_file_path)[0]}{GRAPH_ARRAYS_SUFFIX}"
+
+
+def get_first_tag(value):
+    """
+    Get a single tag value, as osmnx keeps merged ways' tags as lists.
+
+    Args:
+        value: The tag value of an edge.
+
+    Returns:
+        The first tag value, or None if the edge has none.
+    """
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value
+
+
+def parse_maxspeed(value) -> float:
+    """
+    Parse an OSM maxspeed tag into km/h.
+
+    Args:
+        value: The maxspeed tag, e.g. '50' or '30 mph'.
+
+    Returns:
+        float: The speed limit in km/h, or NaN if the tag is missing or not numeric.
+    """
+    match = MAXSPEED_PATTERN.match(str(get_first_tag(value)).strip())
+    if not match:
+        return np.nan
+    speed = float(match.group(1))
+    return speed * MPH_TO_KMH if match.group(2) else speed
+
+
+def is_oneway(value) -> bool:
+    """
+    Check if an edge may only be driven from u to v.
+
+    Args:
+        value: The oneway tag of the edge.
+
+    Returns:
+        bool: True if the edge is one way, otherwise False.
+    """
+    return str(get_first_tag(value)).lower() in ('true', 'yes', '1')
+
+
+def write_graph_arrays(nodes_gdf: gpd.GeoDataFrame, edges_gdf: gpd.GeoDataFrame, graph_path: str) -> dict:
+    """
+    Write a network as a CSR adjacency of .npy files that can be memory-mapped.
+
+    The arrays are written to a temporary folder that then replaces the previous one, so readers
+    never see a half-written graph, and processes that still map the old files keep working.
+
+    Args:
+        nodes_gdf (gpd.GeoDataFrame): Nodes in EPSG:4326, indexed by node ID with 'x' and 'y' columns.
+        edges_gdf (gpd.GeoDataFrame): Edges with 'u' and 'v' node IDs and their OSM tags.
+        graph_path (str): Path to the graph arrays folder.
+
+    Returns:
+        dict: The metadata written with the arrays.
+    """
+    node_index = pd.Index(nodes_gdf.index.to_numpy())
+    src = node_index.get_indexer(edges_gdf['u'].astype('int64'))
+    dst = node_index.get_indexer(edges_gdf['v'].astype('int64'))
+    valid = (src >= 0) & (dst >= 0)
+    edges_gdf, src, dst = edges_gdf[valid], src[valid], dst[valid]
+    if edges_gdf.crs is None:
+        edges_gdf = edges_gdf.set_crs('EPSG:4326')
+
+    highway = edges_gdf['highway'].map(get_first_tag) if 'highway' in edges_gdf else pd.Series([None] * len(edges_gdf))
+    highway_codes, highway_tags = pd.factorize(highway.fillna(''))
+    order = np.argsort(src, kind='stable')
+    node_count = len(nodes_gdf)
+
+    arrays = {
+        'node_x': nodes_gdf['x'].to_numpy(dtype=np.float32),
+        'node_y': nodes_gdf['y'].to_numpy(dtype=np.float32),
+        'node_ids': nodes_gdf.index.to_numpy(dtype=np.int64),
+        'indptr': np.concatenate([[0], np.cumsum(np.bincount(src, minlength=node_count))]).astype(np.int32),
+        'indices': dst[order].astype(np.int32),
+        'edge_length': edges_gdf.to_crs(edges_gdf.estimate_utm_crs()).length.to_numpy(dtype=np.float32)[order],
+        'edge_highway': highway_codes.astype(np.int16)[order],
+        'edge_maxspeed': (
+            edges_gdf['maxspeed'].map(parse_maxspeed).to_numpy(dtype=np.float32)[order]
+            if 'maxspeed' in edges_gdf else np.full(len(order), np.nan, dtype=np.float32)
+        ),
+        'edge_oneway': (
+            edges_gdf['oneway'].map(is_oneway).to_numpy(dtype=bool)[order]
+            if 'oneway' in edges_gdf else np.zeros(len(order), dtype=bool)
+        ),
+    }
+    meta = {
+        'version': GRAPH_ARRAYS_VERSION,
+        'node_count': node_count,
+        'edge_count': int(len(order)),
+        'highway_tags': [str(tag) for tag in highway_tags],
+    }
+
+    temp_path = f"{graph_path}.tmp-{os.getpid()}"
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_path, f"{name}.npy"), array)
+    with open(os.path.join(temp_path, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+    old_path = f"{graph_path}.old-{os.getpid()}"
+    if os.path.exists(graph_path):
+        os.replace(graph_path, old_path)
+    os.replace(temp_path, graph_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    print(f"Graph arrays with {node_count} nodes / {meta['edge_count']} edges written to {graph_path}.")
+    return meta
+
+
+def load_graph_arrays(graph_path: str) -> dict:
+    """
+    Memory-map the graph arrays of a network.
+
+    Nothing is parsed or copied, so loading takes milliseconds for any graph size, and the
+    pages are shared between every process that maps the same files.
+
+    Args:
+        graph_path (str): Path to the graph arrays folder.
+
+    Returns:
+        dict: The read-only arrays by name and the metadata under 'meta'.
+
+    Raises:
+        FileNotFoundError: If no graph arrays have been written to the folder.
+        ValueError: If the arrays were written in an unsupported format version.
+    """
+    with open(os.path.join(graph_path, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('version') != GRAPH_ARRAYS_VERSION:
+        raise ValueError(f"Unsupported graph arrays version {meta.get('version')} in {graph_path}.")
+
+    graph = {name: np.load(os.path.join(graph_path, f"{name}.npy"), mmap_mode='r') for name in NODE_ARRAYS + EDGE_ARRAYS}
+    graph['meta'] = meta
+    return graph
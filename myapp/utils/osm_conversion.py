@@ -8,16 +8,27 @@ import xml.etree.ElementTree as ET
 import warnings
 import logging
 import time
+import hashlib
+from .graph_arrays import write_graph_arrays, get_graph_arrays_path
 
-def configure_osmnx_cache():
+BASE_NETWORK_FOLDER = "base_networks"
+BASE_NETWORK_MAX_AGE = 7 * 24 * 3600  # seconds
+
+def get_osm_cache_folder() -> str:
     """
-    Configures the osmnx cache folder to a persistent folder with non-root permissions
+    Returns the OSM cache folder on the shared volume, so downloads made by one pod are reused by the others.
     """
     # Get the directory of the current file
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Define the cache folder relative to the current directory
-    cache_folder = os.path.join(current_dir, "../temp/osmnx_cache")
+
+    return os.path.join(current_dir, "../media/user_osm_files/osm_cache")
+
+def configure_osmnx_cache():
+    """
+    Configures the osmnx cache folder to a persistent folder with non-root permissions
+    """
+    # Define the cache folder on the shared volume
+    cache_folder = os.path.join(get_osm_cache_folder(), "osmnx")
     
     # Ensure the cache directory exists
     os.makedirs(cache_folder, exist_ok=True)
@@ -25,6 +36,38 @@ def configure_osmnx_cache():
     # Set the osmnx cache folder
     ox.settings.cache_folder = cache_folder
 
+def get_base_network_cache_path(bounds, network_type: str) -> str:
+    """
+    Get the cache file of the preprocessed base network of a bounding box.
+
+    Args:
+        bounds: The (west, south, east, north) bounds of the bounding box.
+        network_type (str): Type of network downloaded.
+
+    Returns:
+        str: Path to the cached nodes and edges.
+    """
+    key = f"{ox.__version__}:{network_type}:" + ",".join(f"{value:.6f}" for value in bounds)
+    return os.path.join(get_osm_cache_folder(), BASE_NETWORK_FOLDER, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.pkl")
+
+def prune_base_network_cache(max_age_seconds: int = BASE_NETWORK_MAX_AGE):
+    """
+    Remove cached base networks that have not been written for a while.
+
+    Args:
+        max_age_seconds (int): The age after which a cached network is removed.
+    """
+    cache_folder = os.path.join(get_osm_cache_folder(), BASE_NETWORK_FOLDER)
+    if not os.path.isdir(cache_folder):
+        return
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(cache_folder):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
 def log_time(func):
     """
     Test the times each func takes to narrow down bottlenecks.
@@ -42,6 +85,8 @@ def get_osm_data_from_bbox(bbox_gdf: gpd.GeoDataFrame, network_type: str = 'all'
     """
     Get OSM data within the bounding box of a given GeoDataFrame.
 
+    The preprocessed nodes and edges are cached on the shared volume per bounding box.
+
     Args:
         bbox_gdf (gpd.GeoDataFrame): GeoDataFrame containing a polygon that defines the bounding box.
         network_type (str): Type of network to download ('drive', 'walk', 'bike', 'all').
@@ -58,6 +103,14 @@ def get_osm_data_from_bbox(bbox_gdf: gpd.GeoDataFrame, network_type: str = 'all'
     bounds = bbox_gdf.total_bounds  # returns (minx, miny, maxx, maxy)
     west, south, east, north = bounds
 
+    # A prefetch started when the box was drawn may already have prepared this network
+    cache_path = get_base_network_cache_path(bounds, network_type)
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception as e:
+            print(f"Ignoring unreadable base network cache {cache_path}: {e}")
+
     # Get OSM data from the bounding box
     G = ox.graph_from_bbox(north, south, east, west, network_type=network_type, simplify=False)
 
@@ -67,8 +120,29 @@ def get_osm_data_from_bbox(bbox_gdf: gpd.GeoDataFrame, network_type: str = 'all'
     # Drop the index so the u and v indexes are now just columns
     edges_gdf_reset = edges_gdf.reset_index()
 
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = f"{cache_path}.tmp-{os.getpid()}"
+    pd.to_pickle((nodes_gdf, edges_gdf_reset), temp_path)
+    os.replace(temp_path, cache_path)
+
     return nodes_gdf, edges_gdf_reset
 
+def prefetch_base_network(bbox_gdf: gpd.GeoDataFrame, network_type: str = 'all') -> tuple:
+    """
+    Download and preprocess the base network of a bounding box into the shared cache ahead of a build.
+
+    Args:
+        bbox_gdf (gpd.GeoDataFrame): GeoDataFrame containing a polygon that defines the bounding box.
+        network_type (str): Type of network to download ('drive', 'walk', 'bike', 'all').
+
+    Returns:
+        tuple: The number of nodes and edges of the base network.
+    """
+    configure_osmnx_cache()
+    prune_base_network_cache()
+    nodes_gdf, edges_gdf = get_osm_data_from_bbox(bbox_gdf, network_type)
+    return len(nodes_gdf), len(edges_gdf)
+
 #@log_time
 def combine_custom_lines_with_osm_edges(custom: gpd.GeoDataFrame, edges_gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
     """
@@ -505,8 +579,11 @@ def run_all(bbox_gdf: gpd.GeoDataFrame, custom_data_gdf: gpd.GeoDataFrame, osm_f
     Args:
         bbox_gdf (gpd.GeoDataFrame): Bounding box GeoDataFrame.
         custom_data_gdf (gpd.GeoDataFrame): Custom data GeoDataFrame.
-        osm_file_path (str): Path to the output OSM XML file.
+        osm_file_path (str): Path to the output OSM XML file. The graph arrays are written next to it.
         network_tags (dict): Dictionary of network tags to update.
+
+    Returns:
+        tuple: The final nodes and edges GeoDataFrames written to the OSM file.
     """
 
     # logging.basicConfig(filename='function_times.log', level=logging.INFO)
@@ -553,6 +630,11 @@ def run_all(bbox_gdf: gpd.GeoDataFrame, custom_data_gdf: gpd.GeoDataFrame, osm_f
 
     write_osm_xml(combined_points_gdf, split_lines_combined_gdf_final, osm_file_path)
 
+    # Keep the final network as memory-mappable arrays, so nothing has to parse the OSM file again
+    write_graph_arrays(combined_points_gdf, split_lines_combined_gdf_final, get_graph_arrays_path(osm_file_path))
+
+    return combined_points_gdf, split_lines_combined_gdf_final
+
 
 
 
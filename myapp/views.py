@@ -1,15 +1,19 @@
 
+import json
+import os
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ValidationError
 from django.core.serializers import serialize
-from django.http import HttpResponse, JsonResponse, HttpRequest
+from django.http import HttpResponse, JsonResponse, HttpRequest, StreamingHttpResponse, FileResponse
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect
 
 from .forms import NetworkTypeForm, IsochroneForm, CustomAuthForm
-from .models import GeoData, BoxGeometry, Isochrone, UserRoutingPod
+from .models import GeoData, BoxGeometry, Isochrone, IsochronePreferences, UserRoutingPod, AccessibilityGrid, TravelTimeMatrix
 
 from .utils.osm_conversion import run_all
 
@@ -32,17 +36,25 @@ from .services.prepare_docker_data import (
     get_geodata_gdfs,
     prepare_folders
 )
+from .services.graphhopper_config import FLEXIBLE_MODE_MAX_EDGES, write_user_graphhopper_config
 from .services.prepare_isochrone_data import (
     check_marker_geometry,
     get_user_isochrone_preferences,
     prepare_marker_geodata
 )
 from .services.routing_queries import handle_isochrone_creation
+from .services.isochrone_batch import parse_batch_request, run_isochrone_batch
+from .services.local_routing import get_local_graph_path, load_local_graph
+from .services.travel_time_matrix import parse_matrix_request, iter_matrix_tiles, get_matrix_path
+from .services.accessibility_grid import parse_accessibility_request, get_accessibility_raster_path
+from .tasks import compute_accessibility, compute_matrix
 
 from .services.create_routing_pod import (
+    get_graph_artifact_hash,
     create_or_update_deployment_and_service,
-    is_user_pod_running
+    use_local_routing
 )
+from .services.routing_pod_status import is_routing_pod_starting, is_user_pod_running, mark_routing_pod_used
 
 def login_view(request):
     """user 
@@ -157,7 +169,7 @@ def geojson_view(request: HttpRequest) -> HttpResponse:
         'isochrone_string': isochrone_string,
         'all_geojson_data': serialize('geojson', user_geojson_data, geometry_field='geom', fields=('id',)),
         'latest_drawn_geometry': serialize('geojson', [latest_drawn_geometry_query], geometry_field='geom', fields=('id',)) if latest_drawn_geometry_query else None,
-        'latest_marker_geometry': serialize('geojson', [latest_marker_geometry_query], geometry_field='geom', fields=('id',)) if latest_marker_geometry_query else None,
+        'latest_marker_geometry': serialize('geojson', latest_marker_geometry_query, geometry_field='geom', fields=('id',)) if latest_marker_geometry_query.exists() else None,
         'latest_isochrone_geometry': serialize('geojson', latest_isochrone_geometry, geometry_field='geom', fields=('id',)) if latest_isochrone_geometry.exists() else None
     })
 
@@ -184,9 +196,17 @@ def integrate_data_and_run_docker(request: HttpRequest) -> JsonResponse:
     update_previous_inputs(previous_inputs, last_geodata, last_box_geometry, last_network_type)
 
     user_id = user.id
+    # An idle pod is scaled back up from its graph-cache instead of being rebuilt
+    container_resumed = mark_routing_pod_used(user_id)
     container_running = is_user_pod_running(user_id, request, True)
-
-    if inputs_changed or not container_running:
+    user_pod_obj.refresh_from_db()
+    # A pod that is still loading its graph will become ready without a rebuild
+    container_starting = container_resumed or (
+        user_pod_obj.desired_state == UserRoutingPod.DESIRED_RUNNING and
+        user_pod_obj.routing_status in (UserRoutingPod.STATUS_PENDING, UserRoutingPod.STATUS_IMPORTING)
+    )
+
+    if inputs_changed or not (container_running or container_starting):
         if user.is_authenticated:
             user_id = user.id
 
@@ -200,17 +220,38 @@ def integrate_data_and_run_docker(request: HttpRequest) -> JsonResponse:
         elif not has_box_geometry:
             return JsonResponse({"error": "You need to draw and upload a bounding box."}, status=400)
 
-        user_pod_obj.button_activate = False
-        user_pod_obj.save()
-
         network_tags = get_network_tags(user)
 
         gdf_qs, gdf_drawn = get_geodata_gdfs(user)
         output_osm_path, output_yaml_path = prepare_folders(user_id)
 
-        run_all(gdf_drawn, gdf_qs, output_osm_path, network_tags)
-        create_or_update_deployment_and_service(user_id, request)
-        is_user_pod_running(user_id, request, False)
+        nodes_gdf, edges_gdf = run_all(gdf_drawn, gdf_qs, output_osm_path, network_tags)
+
+        node_count, edge_count = len(nodes_gdf), len(edges_gdf)
+
+        isochrone_preferences, _ = IsochronePreferences.objects.get_or_create(user=user)
+        write_user_graphhopper_config(output_yaml_path, isochrone_preferences.mode_selection, node_count, edge_count)
+
+        artifact_hash = get_graph_artifact_hash(output_osm_path, output_yaml_path)
+
+        # Small networks are answered in-process within milliseconds, without starting a pod
+        if settings.LOCAL_ROUTING_MAX_EDGES and edge_count <= min(settings.LOCAL_ROUTING_MAX_EDGES, FLEXIBLE_MODE_MAX_EDGES):
+            use_local_routing(user_id, artifact_hash, node_count, edge_count)
+            return JsonResponse({'status': 'success'})
+
+        # Only a new graph or a missing pod leads to a new pod, whose status the pod watcher reports.
+        # In blue/green mode a ready pod keeps serving until the new graph has taken over.
+        keeps_serving = (
+            settings.ROUTING_BLUE_GREEN and user_pod_obj.engine == UserRoutingPod.ENGINE_GRAPHHOPPER and
+            user_pod_obj.routing_status == UserRoutingPod.STATUS_READY
+        )
+        if (artifact_hash != user_pod_obj.artifact_hash and not keeps_serving) or user_pod_obj.routing_status in (UserRoutingPod.STATUS_STOPPED, UserRoutingPod.STATUS_FAILED):
+            user_pod_obj.button_activate = False
+            user_pod_obj.routing_status = UserRoutingPod.STATUS_PENDING
+            user_pod_obj.save()
+
+        # The routing reconciler builds the graph and starts the pod; the page polls for readiness
+        create_or_update_deployment_and_service(user_id, request, artifact_hash, node_count, edge_count)
 
     return JsonResponse({'status': 'success'})
 
@@ -220,6 +261,9 @@ def container_button_activate(request):
     """
     Checks if the container button is activated for the logged-in user.
 
+    While a rebuilt graph is still being brought up, 'updating' is True even if the
+    previous graph keeps serving requests.
+
     Args:
         request (HttpRequest): The HTTP request object.
 
@@ -228,9 +272,17 @@ def container_button_activate(request):
     """
     try:
         user_port_obj = UserRoutingPod.objects.get(user=request.user)
-        return JsonResponse({'isRunning': user_port_obj.button_activate})
+        updating = (
+            user_port_obj.desired_state == UserRoutingPod.DESIRED_RUNNING and
+            user_port_obj.artifact_hash != user_port_obj.active_artifact_hash
+        )
+        return JsonResponse({
+            'isRunning': user_port_obj.button_activate,
+            'status': user_port_obj.routing_status,
+            'updating': updating
+        })
     except UserRoutingPod.DoesNotExist:
-        return JsonResponse({'isRunning': False})
+        return JsonResponse({'isRunning': False, 'status': UserRoutingPod.STATUS_STOPPED, 'updating': False})
 
 @login_required
 def container_status_update(request):
@@ -247,9 +299,12 @@ def container_status_update(request):
         return JsonResponse({'is_running': False})
     container_status = UserRoutingPod.objects.filter(user=request.user).first()
     if container_status:
-        return JsonResponse({'is_running': container_status.is_running})
+        return JsonResponse({
+            'is_running': container_status.routing_status == UserRoutingPod.STATUS_READY,
+            'status': container_status.routing_status
+        })
     else:
-        return JsonResponse({'is_running': False})
+        return JsonResponse({'is_running': False, 'status': UserRoutingPod.STATUS_STOPPED})
     
 
 @login_required
@@ -257,6 +312,8 @@ def create_isochrone(request: HttpRequest) -> JsonResponse:
     """
     Main function to handle the creation of isochrones.
 
+    With several markers, the isochrones of all of them are merged per bucket.
+
     Args:
         request (HttpRequest): The HTTP request.
 
@@ -265,13 +322,208 @@ def create_isochrone(request: HttpRequest) -> JsonResponse:
     """
     try:
         check_marker_geometry(request.user)
+        if mark_routing_pod_used(request.user.id) or is_routing_pod_starting(request.user.id):
+            # The page polls the pod status and asks again once the pod is ready
+            return JsonResponse({'status': 'pending'}, status=202)
         isochrone_params = get_user_isochrone_preferences(request.user)
-        point_coordinates = prepare_marker_geodata(request.user)
-        return handle_isochrone_creation(request.user, isochrone_params, point_coordinates)
+        origins = prepare_marker_geodata(request.user)
+        return handle_isochrone_creation(request.user, isochrone_params, origins)
     except ValidationError as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@login_required
+@require_POST
+def create_isochrone_batch(request: HttpRequest) -> HttpResponse:
+    """
+    Creates isochrones for many origins and parameter sets in one request.
+
+    Results are streamed back as newline-delimited JSON as they complete, one line per origin
+    and parameter set with its latency or error, followed by a summary line.
+
+    Args:
+        request (HttpRequest): The HTTP request with a JSON body of origins and optional parameter sets.
+
+    Returns:
+        HttpResponse: A streaming NDJSON response, or a JSON error response.
+    """
+    try:
+        isochrone_params = get_user_isochrone_preferences(request.user)
+        origins, param_sets = parse_batch_request(request.user, request.body, isochrone_params)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+
+    mark_routing_pod_used(request.user.id)
+    events = run_isochrone_batch(request.user, isochrone_params, origins, param_sets)
+    return StreamingHttpResponse((json.dumps(event) + '\n' for event in events), content_type='application/x-ndjson')
+
+
+@login_required
+@require_POST
+def create_travel_time_matrix(request: HttpRequest) -> HttpResponse:
+    """
+    Computes travel times from many origins to many destinations over the user's network.
+
+    For small networks the matrix is streamed as row-major little-endian float32 seconds, one
+    tile of origins at a time, with its shape in the X-Matrix-Shape header. Networks above
+    MATRIX_MAX_EDGES are too large to load into a web worker, so a background job is queued
+    instead, whose result is downloaded in the same format once it is done.
+
+    Args:
+        request (HttpRequest): The HTTP request with a JSON body of origins, destinations and an optional mode.
+
+    Returns:
+        HttpResponse: A streaming binary response, the ID and status of a queued job, or a JSON error response.
+    """
+    if not os.path.exists(get_local_graph_path(request.user.id)):
+        return JsonResponse({'error': 'Your network has not been built yet. Please build it and try again.'}, status=400)
+    try:
+        isochrone_preferences = IsochronePreferences.objects.filter(user=request.user).first()
+        default_mode = isochrone_preferences.mode_selection if isochrone_preferences else None
+        origins, destinations, mode = parse_matrix_request(request.body, default_mode)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+
+    # Web workers keep the graph, its KD-tree and sparse graphs in memory, so large networks go to a worker
+    user_pod = UserRoutingPod.objects.filter(user=request.user).only('edge_count').first()
+    if user_pod and user_pod.edge_count > settings.MATRIX_MAX_EDGES:
+        matrix = TravelTimeMatrix.objects.create(
+            user=request.user, mode_selection=mode, origins=origins.tolist(), destinations=destinations.tolist()
+        )
+        compute_matrix.delay(matrix.pk)
+        return JsonResponse({'matrix_id': matrix.pk, 'status': matrix.status, 'shape': [len(origins), len(destinations)]}, status=202)
+
+    try:
+        graph = load_local_graph(get_local_graph_path(request.user.id))
+    except (OSError, ValueError):
+        return JsonResponse({'error': 'Your network has not been built yet. Please build it and try again.'}, status=400)
+
+    response = StreamingHttpResponse(iter_matrix_tiles(graph, mode, origins, destinations), content_type='application/octet-stream')
+    response['X-Matrix-Shape'] = f"{len(origins)},{len(destinations)}"
+    response['X-Matrix-Mode'] = mode
+    return response
+
+
+@login_required
+def travel_time_matrix_status(request: HttpRequest, matrix_id: int) -> JsonResponse:
+    """
+    Returns the status of a travel-time matrix job.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+        matrix_id (int): The ID of the matrix.
+
+    Returns:
+        JsonResponse: The status, shape and mode of the matrix.
+    """
+    matrix = TravelTimeMatrix.objects.filter(pk=matrix_id, user=request.user).first()
+    if not matrix:
+        return JsonResponse({'error': 'Travel-time matrix not found.'}, status=404)
+    return JsonResponse({
+        'matrix_id': matrix.pk,
+        'status': matrix.status,
+        'error': matrix.error,
+        'mode': matrix.mode_selection,
+        'shape': [len(matrix.origins), len(matrix.destinations)]
+    })
+
+
+@login_required
+def travel_time_matrix_data(request: HttpRequest, matrix_id: int) -> HttpResponse:
+    """
+    Downloads the travel times of a finished travel-time matrix job.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+        matrix_id (int): The ID of the matrix.
+
+    Returns:
+        HttpResponse: The row-major little-endian float32 seconds with the X-Matrix-Shape header, or an error.
+    """
+    matrix = TravelTimeMatrix.objects.filter(pk=matrix_id, user=request.user, status=TravelTimeMatrix.STATUS_DONE).first()
+    matrix_path = get_matrix_path(matrix_id)
+    if not matrix or not os.path.exists(matrix_path):
+        return JsonResponse({'error': 'Travel-time matrix not found.'}, status=404)
+    response = FileResponse(open(matrix_path, 'rb'), as_attachment=True, filename=f"matrix_{matrix_id}.f32",
+                            content_type='application/octet-stream')
+    response['X-Matrix-Shape'] = f"{len(matrix.origins)},{len(matrix.destinations)}"
+    response['X-Matrix-Mode'] = matrix.mode_selection
+    return response
+
+
+@login_required
+@require_POST
+def create_accessibility_grid(request: HttpRequest) -> JsonResponse:
+    """
+    Starts a background job computing the travel time to the nearest facility for every cell
+    of the user's bounding box.
+
+    Args:
+        request (HttpRequest): The HTTP request with an optional JSON body of facilities, mode and cell size.
+
+    Returns:
+        JsonResponse: The ID and status of the new grid, or an error.
+    """
+    if not os.path.exists(get_local_graph_path(request.user.id)):
+        return JsonResponse({'error': 'Your network has not been built yet. Please build it and try again.'}, status=400)
+    try:
+        isochrone_preferences = IsochronePreferences.objects.filter(user=request.user).first()
+        default_mode = isochrone_preferences.mode_selection if isochrone_preferences else None
+        facilities, mode, cell_size = parse_accessibility_request(request.user, request.body, default_mode)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+
+    grid = AccessibilityGrid.objects.create(user=request.user, mode_selection=mode, cell_size=cell_size, facilities=facilities)
+    compute_accessibility.delay(grid.pk)
+    return JsonResponse({'grid_id': grid.pk, 'status': grid.status}, status=202)
+
+
+@login_required
+def accessibility_grid_status(request: HttpRequest, grid_id: int) -> JsonResponse:
+    """
+    Returns the status of an accessibility grid, and its banded GeoJSON summary once it is done.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+        grid_id (int): The ID of the grid.
+
+    Returns:
+        JsonResponse: The status, shape, bounds and summary of the grid.
+    """
+    grid = AccessibilityGrid.objects.filter(pk=grid_id, user=request.user).first()
+    if not grid:
+        return JsonResponse({'error': 'Accessibility grid not found.'}, status=404)
+    return JsonResponse({
+        'grid_id': grid.pk,
+        'status': grid.status,
+        'error': grid.error,
+        'mode': grid.mode_selection,
+        'cell_size': grid.cell_size,
+        'shape': [grid.rows, grid.cols],
+        'bounds': grid.bounds,
+        'summary': grid.summary
+    })
+
+
+@login_required
+def accessibility_grid_raster(request: HttpRequest, grid_id: int) -> HttpResponse:
+    """
+    Downloads the travel time array of a finished accessibility grid as a .npy file.
+
+    Args:
+        request (HttpRequest): The HTTP request.
+        grid_id (int): The ID of the grid.
+
+    Returns:
+        HttpResponse: The float32 array in seconds with row 0 at the north edge, or an error.
+    """
+    grid = AccessibilityGrid.objects.filter(pk=grid_id, user=request.user, status=AccessibilityGrid.STATUS_DONE).first()
+    raster_path = get_accessibility_raster_path(grid_id)
+    if not grid or not os.path.exists(raster_path):
+        return JsonResponse({'error': 'Accessibility grid not found.'}, status=404)
+    return FileResponse(open(raster_path, 'rb'), as_attachment=True, filename=f"accessibility_{grid_id}.npy")
+
+
 @login_required
 def export_isochrones(request):
     """
@@ -51,6 +51,47 @@ SESSION_COOKIE_AGE = 1800 # 30 mins
 
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        # A Redis instance of its own, so evicting cache entries never touches the Celery broker
+        'LOCATION': os.getenv('CACHE_URL', 'redis://redis-cache:6379/0'),
+    }
+}
+
+# Seconds an isochrone result stays cached; a rebuilt graph gets new cache keys
+ISOCHRONE_CACHE_TTL = int(os.getenv('ISOCHRONE_CACHE_TTL', '3600'))
+
+# Batch isochrone requests: concurrent queries per batch and the largest accepted batch
+ISOCHRONE_BATCH_CONCURRENCY = int(os.getenv('ISOCHRONE_BATCH_CONCURRENCY', '8'))
+ISOCHRONE_BATCH_MAX_JOBS = int(os.getenv('ISOCHRONE_BATCH_MAX_JOBS', '1000'))
+
+# Markers whose isochrones can be merged into one multi-origin result
+ISOCHRONE_MAX_ORIGINS = int(os.getenv('ISOCHRONE_MAX_ORIGINS', '200'))
+
+# Compute and cache the isochrone in the background as soon as markers are saved
+ISOCHRONE_PRECOMPUTE = os.getenv('ISOCHRONE_PRECOMPUTE', 'false').lower() == 'true'
+
+# Download and preprocess the base network in the background as soon as a bounding box is saved
+OSM_PREFETCH_ENABLED = os.getenv('OSM_PREFETCH_ENABLED', 'true').lower() == 'true'
+
+# Networks with at most this many edges are routed in-process instead of by a GraphHopper pod (0 disables).
+# The in-process engine only takes over GraphHopper's flexible tier, so values above
+# graphhopper_config.FLEXIBLE_MODE_MAX_EDGES are capped to it
+LOCAL_ROUTING_MAX_EDGES = int(os.getenv('LOCAL_ROUTING_MAX_EDGES', '0'))
+
+# Travel-time matrices: the largest accepted origin x destination count, origins per streamed tile,
+# and the largest network computed in the request, above which a background job is queued
+MATRIX_MAX_CELLS = int(os.getenv('MATRIX_MAX_CELLS', '4000000'))
+MATRIX_TILE_ROWS = int(os.getenv('MATRIX_TILE_ROWS', '64'))
+MATRIX_MAX_EDGES = int(os.getenv('MATRIX_MAX_EDGES', '50000'))
+
+# Accessibility grids: the largest accepted grid
+ACCESSIBILITY_MAX_CELLS = int(os.getenv('ACCESSIBILITY_MAX_CELLS', '250000'))
+
+# Users absent this many days lose their uploaded network and its built artifacts, 0 keeps them
+USER_FILES_RETENTION_DAYS = int(os.getenv('USER_FILES_RETENTION_DAYS', '30'))
+
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
 
@@ -63,8 +104,34 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'myapp.tasks.check_expired_sessions',
         'schedule': crontab(minute='*/10'),
     },
+    'reconcile_routing_every_cycle': {
+        'task': 'myapp.tasks.reconcile_routing',
+        'schedule': float(os.getenv('ROUTING_RECONCILE_INTERVAL', '5')),  # seconds
+        'options': {'expires': 30},
+    },
 }
 
+# Upper bound on one reconciliation cycle, after which another worker may take over
+ROUTING_RECONCILE_LOCK_SECONDS = 120
+
+# Bring rebuilt graphs up in a second deployment and switch traffic once they are ready
+ROUTING_BLUE_GREEN = os.getenv('ROUTING_BLUE_GREEN', 'false').lower() == 'true'
+
+# Routing pods without isochrone traffic for this long are scaled to zero, 0 keeps them up
+ROUTING_IDLE_SECONDS = int(os.getenv('ROUTING_IDLE_SECONDS', '1800'))
+
+# Serve new graphs from pre-started pool pods when they fit the pool pods' resources
+ROUTING_POOL_ENABLED = os.getenv('ROUTING_POOL_ENABLED', 'false').lower() == 'true'
+ROUTING_POOL_MAX_GRAPH_MB = int(os.getenv('ROUTING_POOL_MAX_GRAPH_MB', '512'))
+
+# Route through one shared headless Service and send isochrone requests straight to pod IPs,
+# instead of creating a ClusterIP Service per user
+ROUTING_SHARED_SERVICE = os.getenv('ROUTING_SHARED_SERVICE', 'false').lower() == 'true'
+
+# Isochrone queries run against a routing pod around the graph's centroid before it is marked ready,
+# so the first user queries do not pay for JIT compilation, 0 disables the warm-up
+ROUTING_WARMUP_QUERIES = int(os.getenv('ROUTING_WARMUP_QUERIES', '5'))
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -87,6 +154,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.middleware.UserActivityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -13,6 +13,13 @@ urlpatterns = [
     path('geojson/', views.geojson_view, name='geojson_view'),
     path('get-geodata/', views.integrate_data_and_run_docker, name='get_geodata'),
     path('make-isochrone/', views.create_isochrone, name='make_isochrone'),
+    path('make-isochrone-batch/', views.create_isochrone_batch, name='make_isochrone_batch'),
+    path('travel-time-matrix/', views.create_travel_time_matrix, name='travel_time_matrix'),
+    path('travel-time-matrix/<int:matrix_id>/', views.travel_time_matrix_status, name='travel_time_matrix_status'),
+    path('travel-time-matrix/<int:matrix_id>/data/', views.travel_time_matrix_data, name='travel_time_matrix_data'),
+    path('accessibility-grid/', views.create_accessibility_grid, name='accessibility_grid'),
+    path('accessibility-grid/<int:grid_id>/', views.accessibility_grid_status, name='accessibility_grid_status'),
+    path('accessibility-grid/<int:grid_id>/raster/', views.accessibility_grid_raster, name='accessibility_grid_raster'),
     path('export-isochrones/', views.export_isochrones, name='export_isochrones'),
     path('container-button-activate/', views.container_button_activate, name='container_button_activate'),
     path('container-status-update/', views.container_status_update, name='container_status_update'),